@@ -0,0 +1,129 @@
+"""
+tracemalloc report for the capture -> buffer -> BGR2RGB part of the
+recognition loop, with and without the frame buffer pool.
+
+For every consumed frame the tracemalloc peak is reset and the growth
+of the peak over the frame is recorded, i.e. how much memory the
+capture and consumer threads allocated during that frame. The pooled
+pipeline should stay close to zero in steady state.
+
+    python benchmarks/bench_allocations.py [--video clip.mp4] [--frames 200]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import tracemalloc
+import numpy as np
+import cv2 as cv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from camera.capture import FrameGrabber, LatestFrame
+from camera.buffers import reuse_buffer
+
+
+class SyntheticCapture:
+    """Camera stand-in at 30 FPS; like cv.VideoCapture it fills image= when given."""
+
+    def __init__(self, shape=(480, 640, 3), fps=30):
+        rng = np.random.default_rng(0)
+        self.frames = [rng.integers(0, 255, size=shape, dtype=np.uint8) for _ in range(4)]
+        self.period = 1.0 / fps
+        self.count = 0
+
+    def read(self, image=None):
+        time.sleep(self.period)
+        src = self.frames[self.count % len(self.frames)]
+        self.count += 1
+        if image is None or image.shape != src.shape:
+            image = np.empty_like(src)
+        image[...] = src
+        return True, image
+
+    def release(self):
+        pass
+
+
+class NaiveGrabber:
+    """The pre-pool behaviour: cap.read() allocates a new frame every time."""
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.buffer = LatestFrame()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.buffer.put(frame)
+        self.buffer.close()
+
+    def stop(self):
+        self._running = False
+        self._thread.join(1.0)
+
+
+def open_source(args):
+    if args.video:
+        cap = cv.VideoCapture(args.video)
+        if not cap.isOpened():
+            raise SystemExit(f"[ERROR] Cannot open {args.video}")
+        return cap
+    return SyntheticCapture()
+
+
+def measure(grabber, pooled, frames, warmup):
+    rgb = None
+    per_frame = []
+    tracemalloc.start()
+    try:
+        for i in range(warmup + frames):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            frame, _ = grabber.buffer.get(timeout=2.0)
+            if frame is None:
+                break
+            if pooled:
+                rgb = reuse_buffer(rgb, frame)
+                cv.cvtColor(frame, cv.COLOR_BGR2RGB, dst=rgb)
+                grabber.buffer.recycle(frame)
+            else:
+                rgb = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+            _, peak = tracemalloc.get_traced_memory()
+            if i >= warmup:
+                per_frame.append(peak - base)
+    finally:
+        tracemalloc.stop()
+        grabber.stop()
+    return np.array(per_frame, dtype=np.float64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame allocation report")
+    parser.add_argument('--video', help='Video file to read instead of the synthetic camera')
+    parser.add_argument('--frames', type=int, default=200, help='Frames measured per mode')
+    parser.add_argument('--warmup', type=int, default=20, help='Frames ignored before measuring')
+    args = parser.parse_args()
+
+    print(f"{'mode':>7} {'mean KiB/frame':>15} {'p99 KiB/frame':>14}")
+    for mode in ("naive", "pooled"):
+        cap = open_source(args)
+        grabber = FrameGrabber(cap).start() if mode == "pooled" else NaiveGrabber(cap).start()
+        per_frame = measure(grabber, mode == "pooled", args.frames, args.warmup) / 1024.0
+        cap.release()
+        if len(per_frame) == 0:
+            print(f"{mode:>7} no frames")
+            continue
+        print(f"{mode:>7} {per_frame.mean():>15.1f} {np.percentile(per_frame, 99):>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Recall@1, latency and memory of the IVF index (recognition/ann.py)
+against the exact brute-force Gallery scan, on synthetic identities.
+
+Each identity is one 128-d encoding drawn around one of --groups
+appearance clusters, since real descriptors are not spread uniformly;
+query faces are gallery rows plus noise. Recall@1 is the fraction of
+faces whose nearest identity the index returns.
+
+    python benchmarks/bench_ann.py [--sizes 10000 100000 1000000] [--probes 1 4 8 16 32]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from recognition.gallery import Gallery
+from recognition.ann import IVFIndex
+
+CHUNK = 100_000
+
+
+def synthetic_identities(n, groups, dim=128, seed=0):
+    """n encodings with roughly the norm of real dlib descriptors, clustered in groups."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0.0, 0.09, size=(groups, dim)).astype(np.float32)
+    encs = np.empty((n, dim), dtype=np.float32)
+    for first in range(0, n, CHUNK):
+        rows = min(CHUNK, n - first)
+        encs[first:first + rows] = (centers[rng.integers(groups, size=rows)]
+                                    + rng.normal(0.0, 0.05, size=(rows, dim)).astype(np.float32))
+    return encs
+
+
+def timed(fn, faces):
+    """(results, per-face latencies in ms, peak traced KiB) of fn over every face."""
+    fn(faces[:1])  # warm-up
+    results, latencies = [], []
+    for face in faces:
+        start = time.perf_counter()
+        results.append(fn(face[None, :])[0][0])
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    # traced separately so tracing does not inflate the latencies
+    tracemalloc.start()
+    for face in faces[:10]:
+        fn(face[None, :])
+    peak = tracemalloc.get_traced_memory()[1] / 1024.0
+    tracemalloc.stop()
+    return results, np.asarray(latencies), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN index benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='Gallery sizes (identities)')
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 4, 8, 16, 32],
+                        help='nprobe values to measure')
+    parser.add_argument('--lists', type=int, default=0, help='Inverted lists (0 = sqrt(size))')
+    parser.add_argument('--groups', type=int, default=512, help='Appearance clusters in the synthetic data')
+    parser.add_argument('--queries', type=int, default=200, help='Faces matched per size')
+    args = parser.parse_args()
+
+    print(f"{'identities':>10} {'method':>10} {'recall@1':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'index MiB':>10} {'query KiB':>10}")
+    for n in args.sizes:
+        encs = synthetic_identities(n, args.groups)
+        names = [str(i) for i in range(n)]
+        rng = np.random.default_rng(1)
+        faces = (encs[rng.choice(n, args.queries, replace=False)]
+                 + rng.normal(0.0, 0.03, size=(args.queries, encs.shape[1])).astype(np.float32))
+
+        gallery = Gallery(encs, names)
+        exact, lat, peak = timed(gallery.match, faces)
+        gallery_mib = (gallery.matrix.nbytes + gallery.norms.nbytes) / 2**20
+        print(f"{n:>10} {'brute':>10} {1.0:>9.3f} {np.percentile(lat, 50):>8.3f} "
+              f"{np.percentile(lat, 99):>8.3f} {gallery_mib:>10.1f} {peak:>10.1f}")
+        del gallery
+
+        start = time.perf_counter()
+        index = IVFIndex.train(encs, args.lists)
+        index.add(encs, names)
+        build_s = time.perf_counter() - start
+        del encs
+        for nprobe in args.probes:
+            index.nprobe = nprobe
+            found, lat, peak = timed(index.match, faces)
+            recall = np.mean([a == b for a, b in zip(found, exact)])
+            print(f"{n:>10} {f'ivf/{nprobe}':>10} {recall:>9.3f} {np.percentile(lat, 50):>8.3f} "
+                  f"{np.percentile(lat, 99):>8.3f} {index.nbytes() / 2**20:>10.1f} {peak:>10.1f}")
+        print(f"{'':>10} {len(index.centroids)} lists, built in {build_s:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Frames per second of the detect + encode + match step at several
+detection scales, replayed from a video file or a single image.
+
+    python benchmarks/bench_detect_scale.py --video clip.mp4
+    python benchmarks/bench_detect_scale.py --image face.jpg
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2 as cv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from recognition.gallery import Gallery
+from recognition.pipeline import recognize_frame
+
+SCALES = [1.0, 0.5, 0.25]
+
+
+def read_frames(args):
+    """Load up to --frames frames at 640x480, as the webcam delivers them."""
+    frames = []
+    if args.video:
+        cap = cv.VideoCapture(args.video)
+        while len(frames) < args.frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(cv.resize(frame, (640, 480)))
+        cap.release()
+    else:
+        img = cv.imread(args.image)
+        if img is None:
+            raise SystemExit(f"[ERROR] cv.imread failed: {args.image}")
+        frames = [cv.resize(img, (640, 480))] * args.frames
+    if not frames:
+        raise SystemExit("[ERROR] No frames to replay.")
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection scale benchmark")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video', help='Video file to replay')
+    source.add_argument('--image', help='Single image replayed as every frame')
+    parser.add_argument('--frames', type=int, default=50, help='Frames replayed per scale')
+    args = parser.parse_args()
+
+    frames = read_frames(args)
+    rng = np.random.default_rng(0)
+    gallery = Gallery(rng.normal(0.0, 0.09, size=(100, 128)), [f"id{i}" for i in range(100)])
+
+    print(f"{'scale':>5} {'FPS':>7} {'faces/frame':>12}")
+    for scale in SCALES:
+        faces = 0
+        start = time.perf_counter()
+        for frame in frames:
+            rgb = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+            faces += len(recognize_frame(rgb, gallery, 0.5, detect_scale=scale))
+        elapsed = time.perf_counter() - start
+        print(f"{scale:>5} {len(frames) / elapsed:>7.1f} {faces / len(frames):>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
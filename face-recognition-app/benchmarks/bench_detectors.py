@@ -0,0 +1,82 @@
+"""
+Latency and recall of the hog, haar and dnn detector backends on a fixed
+labelled image set.
+
+The labels file is JSON mapping an image file name (relative to --images)
+to its ground-truth boxes as [top, right, bottom, left] lists. A box counts
+as found when a detection overlaps it with IoU >= --iou.
+
+    python benchmarks/bench_detectors.py --images faces/ --labels faces/labels.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import cv2 as cv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from face_detection.backends import make_detector, DETECTORS
+from recognition.pipeline import box_iou
+from utils.image_processing import stream_images
+
+
+def load_set(args):
+    with open(args.labels, "r", encoding="utf-8") as f:
+        labels = json.load(f)
+    names = sorted(labels)
+    paths = [os.path.join(args.images, name) for name in names]
+    name_of = dict(zip(paths, names))
+    images, truths = [], []
+    for path, img in stream_images(paths, transform=lambda im: cv.cvtColor(im, cv.COLOR_BGR2RGB)):
+        images.append(img)
+        truths.append([tuple(box) for box in labels[name_of[path]]])
+    return images, truths
+
+
+def recall(detections, truths, iou):
+    found = total = 0
+    for dets, boxes in zip(detections, truths):
+        total += len(boxes)
+        found += sum(1 for box in boxes if any(box_iou(box, d) >= iou for d in dets))
+    return found / total if total else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector backend comparison")
+    parser.add_argument('--images', required=True, help='Directory of benchmark images')
+    parser.add_argument('--labels', required=True, help='JSON file of ground-truth boxes')
+    parser.add_argument('--iou', type=float, default=0.4, help='IoU needed to count a box as found')
+    parser.add_argument('--batch', type=int, default=8, help='Frames per batched forward pass')
+    args = parser.parse_args()
+
+    images, truths = load_set(args)
+    if not images:
+        raise SystemExit("[ERROR] No benchmark images.")
+
+    print(f"{'backend':>8} {'mean ms':>8} {'p95 ms':>7} {'batched ms/img':>15} {'recall':>7}")
+    for name in sorted(DETECTORS):
+        try:
+            detector = make_detector(name)
+        except (IOError, cv.error) as e:
+            print(f"{name:>8} skipped: {e}")
+            continue
+        detector.detect(images[0])  # warm-up
+        latencies, detections = [], []
+        for rgb in images:
+            start = time.perf_counter()
+            detections.append(detector.detect(rgb))
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+        start = time.perf_counter()
+        for first in range(0, len(images), args.batch):
+            detector.detect_batch(images[first:first + args.batch])
+        batched = (time.perf_counter() - start) * 1000.0 / len(images)
+
+        print(f"{name:>8} {np.mean(latencies):>8.1f} {np.percentile(latencies, 95):>7.1f} "
+              f"{batched:>15.1f} {recall(detections, truths, args.iou):>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
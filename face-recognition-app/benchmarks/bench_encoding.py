@@ -0,0 +1,76 @@
+"""
+Encoding cost for frames with 1, 3 and 8 faces: one face_encodings call
+per location (the old loop) against one batched call per frame.
+
+    python benchmarks/bench_encoding.py --image path/to/face.jpg
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2 as cv
+import face_recognition
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from recognition.pipeline import dedupe_boxes
+
+FACE_COUNTS = [1, 3, 8]
+FRAME_SIZE = (640, 480)
+
+
+def face_tile(rgb, size):
+    """Crop the first face of the image with some margin and resize it."""
+    locs = face_recognition.face_locations(rgb)
+    if not locs:
+        raise SystemExit("[ERROR] No face in the benchmark image.")
+    top, right, bottom, left = locs[0]
+    pad = (bottom - top) // 2
+    crop = rgb[max(0, top - pad):bottom + pad, max(0, left - pad):right + pad]
+    return cv.resize(crop, (size, size))
+
+
+def compose_frame(tile, count):
+    """Paste count copies of the tile on a grid in a 640x480 frame."""
+    width, height = FRAME_SIZE
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    size = tile.shape[0]
+    cols = width // size
+    for i in range(count):
+        y, x = (i // cols) * size, (i % cols) * size
+        frame[y:y + size, x:x + size] = tile
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame encoding benchmark")
+    parser.add_argument('--image', required=True, help='Image containing one face')
+    parser.add_argument('--repeat', type=int, default=10, help='Frames timed per face count')
+    args = parser.parse_args()
+
+    img = cv.imread(args.image)
+    if img is None:
+        raise SystemExit(f"[ERROR] cv.imread failed: {args.image}")
+    tile = face_tile(cv.cvtColor(img, cv.COLOR_BGR2RGB), 160)
+
+    print(f"{'faces':>5} {'found':>5} {'per-location ms':>16} {'batched ms':>11}")
+    for count in FACE_COUNTS:
+        frame = compose_frame(tile, count)
+        locs = dedupe_boxes(face_recognition.face_locations(frame))
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for loc in locs:
+                face_recognition.face_encodings(frame, [loc])
+        per_loc_ms = (time.perf_counter() - start) / args.repeat * 1000.0
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            face_recognition.face_encodings(frame, locs)
+        batched_ms = (time.perf_counter() - start) / args.repeat * 1000.0
+
+        print(f"{count:>5} {len(locs):>5} {per_loc_ms:>16.1f} {batched_ms:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
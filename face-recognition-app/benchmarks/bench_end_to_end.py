@@ -0,0 +1,121 @@
+"""
+End-to-end replay of labelled clips through the recognition pipeline,
+without a camera: frames per second, time to first match and per-frame
+latency percentiles, for CI.
+
+The labels file is JSON mapping a clip (a video file or a directory of
+frames, relative to --clips) to the name that should be recognized in it,
+or null for clips of strangers. Every frame of a clip is processed in
+order (no frames are dropped); a clip passes when its first match is the
+expected name, or when a null clip produces no match. Results are also
+written as JSON with --out.
+
+    python benchmarks/bench_end_to_end.py --clips clips/ --labels clips/labels.json --store src/reference_gallery
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import cv2 as cv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from camera.sources import open_source, SEQUENCE_FPS
+from camera.buffers import reuse_buffer
+from face_detection.backends import make_detector, DETECTORS
+from recognition.pipeline import recognize_tracked
+from recognition.store import GalleryStore
+from recognition.tracker import FaceTracker
+
+
+def replay(path, gallery, args, detector):
+    """Process every frame of one clip; returns a result dict."""
+    cap = open_source(path, fps=0)
+    if cap is None:
+        return None
+    clip_fps = cap.get(cv.CAP_PROP_FPS) or SEQUENCE_FPS
+    tracker = FaceTracker()
+    latencies = []
+    first = None    # (name, frame index, seconds since the clip started processing)
+    rgb = None
+    start = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        t0 = time.perf_counter()
+        rgb = reuse_buffer(rgb, frame)
+        cv.cvtColor(frame, cv.COLOR_BGR2RGB, dst=rgb)
+        results = recognize_tracked(rgb, gallery, args.threshold, tracker,
+                                    detect_scale=args.scale, detector=detector)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        if first is None:
+            names = [r.name for r in results if r.name is not None]
+            if names:
+                first = (names[0], len(latencies) - 1, time.perf_counter() - start)
+    elapsed = time.perf_counter() - start
+    cap.release()
+    lat = np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        "frames": len(latencies),
+        "fps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "first_match": first[0] if first else None,
+        "time_to_first_match_s": first[2] if first else None,
+        "clip_time_to_first_match_s": first[1] / clip_fps if first else None,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "encoded": tracker.encoded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end clip replay benchmark")
+    parser.add_argument('--clips', required=True, help='Directory the labelled clips are in')
+    parser.add_argument('--labels', required=True, help='JSON file: clip -> expected name or null')
+    parser.add_argument('--store', default="reference_gallery", help='Gallery store directory')
+    parser.add_argument('--flat', action='store_true', help='Match every reference photo, not per identity')
+    parser.add_argument('--threshold', type=float, default=0.5, help='Match threshold (DIST_THRESH)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Frame scale for face detection')
+    parser.add_argument('--detector', default="hog", choices=sorted(DETECTORS), help='Face detector backend')
+    parser.add_argument('--out', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    store = GalleryStore(args.store)
+    if not store.exists():
+        raise SystemExit(f"[ERROR] No gallery store in {args.store!r}; run generate_reference_encoding.py first.")
+    gallery = store.load_gallery() if args.flat else store.load_identity_gallery()[0]
+    detector = make_detector(args.detector)
+    with open(args.labels, "r", encoding="utf-8") as f:
+        labels = json.load(f)
+
+    print(f"{'clip':>24} {'frames':>7} {'FPS':>6} {'first match':>12} {'TTFM s':>7} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'ok':>3}")
+    results = {}
+    for clip in sorted(labels):
+        result = replay(os.path.join(args.clips, clip), gallery, args, detector)
+        if result is None:
+            print(f"{clip[-24:]:>24} unreadable")
+            continue
+        result["expected"] = labels[clip]
+        result["ok"] = result["first_match"] == labels[clip]
+        results[clip] = result
+        ttfm = f"{result['time_to_first_match_s']:.2f}" if result["first_match"] else "-"
+        print(f"{clip[-24:]:>24} {result['frames']:>7} {result['fps']:>6.1f} "
+              f"{str(result['first_match'])[:12]:>12} {ttfm:>7} {result['p50_ms']:>7.1f} "
+              f"{result['p95_ms']:>7.1f} {result['p99_ms']:>7.1f} {'yes' if result['ok'] else 'NO':>3}")
+
+    if not results:
+        raise SystemExit("[ERROR] No clips replayed.")
+    frames = sum(r["frames"] for r in results.values())
+    seconds = sum(r["frames"] / r["fps"] for r in results.values() if r["fps"] > 0)
+    passed = sum(r["ok"] for r in results.values())
+    print(f"\n{passed}/{len(results)} clips correct, {frames} frames at {frames / seconds:.1f} FPS overall")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "clips": results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
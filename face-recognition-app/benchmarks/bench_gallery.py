@@ -0,0 +1,94 @@
+"""
+Per-frame match time of the vectorized Gallery against the original
+face_distance-over-a-list + argmin path, on synthetic 128-d encodings.
+Each identity has --samples reference photos; the IdentityGallery column
+matches the same references grouped into one entry per person.
+
+    python benchmarks/bench_gallery.py [--faces 3] [--samples 8] [--repeat 20]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from recognition.gallery import Gallery
+from recognition.identities import IdentityGallery
+
+try:
+    from face_recognition import face_distance
+except ImportError:
+    def face_distance(face_encodings, face_to_compare):
+        # Same expression face_recognition.face_distance evaluates
+        if len(face_encodings) == 0:
+            return np.empty((0))
+        return np.linalg.norm(face_encodings - face_to_compare, axis=1)
+
+SIZES = [10, 100, 1_000, 10_000, 100_000]
+
+
+def letters(i):
+    """Digit-free person name, so IdentityGallery groups 'abc0', 'abc1', ... as 'abc'."""
+    name = ""
+    while True:
+        i, r = divmod(i, 26)
+        name = chr(ord("a") + r) + name
+        if i == 0:
+            return name
+
+
+def synthetic_encodings(n, dim=128, seed=0):
+    """Random encodings with roughly the norm of real dlib descriptors."""
+    rng = np.random.default_rng(seed)
+    encs = rng.normal(0.0, 0.09, size=(n, dim))
+    return [e for e in encs]
+
+
+def time_per_frame(fn, repeat):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gallery match benchmark")
+    parser.add_argument('--faces', type=int, default=3, help='Faces per frame')
+    parser.add_argument('--repeat', type=int, default=20, help='Frames timed per size')
+    parser.add_argument('--samples', type=int, default=8, help='Reference photos per identity')
+    args = parser.parse_args()
+
+    print(f"{'references':>10} {'list+argmin ms':>15} {'Gallery ms':>11} {'speedup':>8} "
+          f"{'identities':>10} {'Identity ms':>12} {'rows kept':>10}")
+    for n in SIZES:
+        people = np.asarray(synthetic_encodings(-(-n // args.samples)))
+        rng = np.random.default_rng(2)
+        known = [people[i // args.samples] + rng.normal(0.0, 0.02, size=people.shape[1]) for i in range(n)]
+        names = [letters(i // args.samples) + str(i % args.samples) for i in range(n)]
+        faces = synthetic_encodings(args.faces, seed=1)
+        gallery = Gallery.from_known_faces((known, names))
+        identities, _ = IdentityGallery.build(known, names)
+
+        def baseline():
+            for enc in faces:
+                dists = face_distance(known, enc)
+                np.argmin(dists)
+
+        def vectorized():
+            gallery.match(faces, k=1)
+
+        def grouped():
+            identities.match(faces, k=1)
+
+        base_ms = time_per_frame(baseline, args.repeat)
+        fast_ms = time_per_frame(vectorized, args.repeat)
+        ident_ms = time_per_frame(grouped, args.repeat)
+        kept = len(identities) + len(identities.exemplars)
+        print(f"{n:>10} {base_ms:>15.3f} {fast_ms:>11.3f} {base_ms / fast_ms:>7.1f}x "
+              f"{len(identities):>10} {ident_ms:>12.3f} {kept:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Frame stalls while the gallery is hot-reloaded.
+
+A synthetic store of --rows encodings is written to a temporary
+directory. A paced frame loop (--fps, matching --faces faces per frame
+against the current gallery) runs while a child process rewrites the
+store --reloads times with 1% more rows, the way enrollment does, and a
+GalleryReloader loads each new version in the background. The report
+gives per-frame time and the worst lateness in frames (the reload must
+not cost more than one frame) in steady state, while the other process
+writes the store (on a machine with few cores it competes for CPU), and
+while this process loads and swaps in the new version.
+
+    python benchmarks/bench_hot_reload.py [--rows 100000] [--mode identity] [--reloads 3]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from recognition.store import GalleryStore
+from recognition.reload import GalleryReloader
+
+
+def write_store(directory, rows, seed):
+    """Store with rows synthetic samples of rows // 5 people, written like sync() does (a new version)."""
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0.0, 0.09, size=(rows, 128)).astype(np.float32)
+    norms = np.linalg.norm(encodings, axis=1).astype(np.float32)
+    entries = [{"path": f"synthetic/{i}.jpg", "hash": f"{seed}-{i}", "size": 0, "mtime_ns": 0,
+                "name": f"person{i // 5}"} for i in range(rows)]
+    store = GalleryStore(directory)
+    store._commit(entries, {}, encodings / norms[:, None], norms)
+
+
+def loader(store, mode):
+    if mode == "flat":
+        return lambda: store.load_gallery()
+    if mode == "ann":
+        return lambda: store.load_ann_index()[0]
+    return lambda: store.load_identity_gallery()[0]
+
+
+def percentiles(ms):
+    ms = np.asarray(ms) if ms else np.zeros(1)
+    return np.percentile(ms, 50), np.percentile(ms, 99), ms.max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame stalls during gallery hot reload")
+    parser.add_argument('--rows', type=int, default=100_000, help='Encodings in the store')
+    parser.add_argument('--mode', default="identity", choices=("flat", "identity", "ann"),
+                        help='Gallery built from the store (IDENTITY_GALLERY / ANN_INDEX in main.py)')
+    parser.add_argument('--reloads', type=int, default=3, help='Store rewrites during the run')
+    parser.add_argument('--fps', type=float, default=30.0, help='Frame rate of the simulated loop')
+    parser.add_argument('--faces', type=int, default=2, help='Faces matched per frame')
+    parser.add_argument('--interval', type=float, default=0.5, help='Reloader check interval in seconds')
+    parser.add_argument('--rewrite', help=argparse.SUPPRESS)
+    parser.add_argument('--seed', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.rewrite:
+        write_store(args.rewrite, args.rows, args.seed)
+        return
+
+    directory = tempfile.mkdtemp(prefix="bench_reload_")
+    try:
+        write_store(directory, args.rows, 0)
+        store = GalleryStore(directory)
+        load = loader(store, args.mode)
+        start = time.perf_counter()
+        gallery = load()
+        print(f"[INFO] {args.mode} gallery: {len(gallery)} entries from {args.rows} rows, "
+              f"first load {time.perf_counter() - start:.2f}s")
+        reloader = GalleryReloader(store, load, gallery, args.interval).start()
+
+        phase = ["steady"]
+        done = threading.Event()
+
+        def rewrite():
+            for i in range(1, args.reloads + 1):
+                time.sleep(2.0)
+                version = reloader.current[0]
+                phase[0] = "store writes"
+                subprocess.run([sys.executable, os.path.abspath(__file__), "--rewrite", directory,
+                                "--rows", str(args.rows + args.rows // 100 * i), "--seed", str(i)], check=True)
+                phase[0] = "reload + swap"
+                while reloader.current[0] == version:
+                    time.sleep(0.01)
+                time.sleep(0.1)   # the frames right after the swap
+                phase[0] = "steady"
+            time.sleep(1.0)
+            done.set()
+        writer = threading.Thread(target=rewrite, daemon=True)
+        writer.start()
+
+        rng = np.random.default_rng(1)
+        queries = rng.normal(0.0, 0.09, size=(64, args.faces, 128)).astype(np.float32)
+        period = 1.0 / args.fps
+        times = {"steady": [], "store writes": [], "reload + swap": []}
+        lateness = {name: [0.0] for name in times}
+        version, current = reloader.current
+        deadline = time.perf_counter() + period
+        frame = 0
+        while not done.is_set():
+            t0 = time.perf_counter()
+            if reloader.current[0] != version:     # swap between frames, as the workers do
+                version, current = reloader.current
+            current.match(queries[frame % len(queries)], k=1)
+            name = phase[0]
+            times[name].append((time.perf_counter() - t0) * 1000.0)
+            lateness[name].append(max(0.0, time.perf_counter() - deadline) / period)
+            frame += 1
+            pause = deadline - time.perf_counter()
+            if pause > 0:
+                time.sleep(pause)
+            deadline = max(deadline + period, time.perf_counter())
+        reloader.stop()
+
+        print(f"{'frames':>14} {'n':>6} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'late frames':>11}")
+        for name, ms in times.items():
+            p50, p99, worst = percentiles(ms)
+            print(f"{name:>14} {len(ms):>6} {p50:>7.2f} {p99:>7.2f} {worst:>7.2f} {max(lateness[name]):>11.2f}")
+        print(f"\n{reloader.reloads}/{args.reloads} reloads at {args.fps:.0f} FPS, last one loaded in "
+              f"{reloader.last_load_s:.2f}s ({reloader.failed} failed)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
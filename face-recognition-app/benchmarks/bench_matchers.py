@@ -0,0 +1,259 @@
+"""
+Matcher suite: every way of matching a frame's faces against the
+gallery, across gallery sizes, faces per frame and storage dtypes, on
+synthetic 128-d encodings (no camera, no model).
+
+Matchers: the original face_distance over a list + argmin per face, the
+vectorized Gallery, IdentityGallery (one entry per person) and the IVF
+index, the first two at every --dtypes storage. Each identity has
+--samples reference photos; half the query faces are noisy samples of
+enrolled people, half are strangers. Per cell the report gives faces
+per second, p50/p99 per-frame latency, gallery memory, the peak extra
+memory of one match and how many match/no-match decisions at
+--threshold agree with the baseline. Every cell is timed --runs times;
+p50 is the lowest of the runs' p50s, which is what stays stable when
+the machine is busy with something else for a moment.
+
+Right after each cell a fixed NumPy workload is timed as well
+(calib_ms), so a comparison can tell a slower matcher from a machine
+that is slower as a whole at that moment (frequency scaling, other load).
+
+--out writes the rows as JSON (with numpy, platform and git revision);
+--compare old.json prints the p50 change of every cell against an
+earlier run, with the old p50 scaled by how much slower or faster the
+calibration workload ran (median over the cells), and exits with status 1 when one got both
+slower than --tolerance and slower by more than --min-delta ms
+(sub-millisecond cells jitter by tens of percent between identical runs).
+
+    python benchmarks/bench_matchers.py [--sizes 1000 10000 100000] [--faces 1 4 16] --out matchers.json
+    python benchmarks/bench_matchers.py --compare matchers.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from recognition.gallery import Gallery, DTYPES
+from recognition.identities import IdentityGallery, person_name
+from recognition.ann import IVFIndex
+from bench_gallery import face_distance, letters
+
+KEY = ("matcher", "dtype", "size", "faces")
+
+
+def synthetic_gallery(size, samples, seed=0):
+    """(encodings, names): size references, samples per person, named so IdentityGallery groups them."""
+    rng = np.random.default_rng(seed)
+    people = rng.normal(0.0, 0.09, size=(-(-size // samples), 128))
+    known = people[np.arange(size) // samples] + rng.normal(0.0, 0.02, size=(size, 128))
+    names = [letters(i // samples) + str(i % samples) for i in range(size)]
+    return known, names
+
+
+def synthetic_faces(known, count, seed=1):
+    """Half noisy samples of enrolled references, half strangers."""
+    rng = np.random.default_rng(seed)
+    enrolled = known[rng.integers(len(known), size=count // 2)]
+    spread = rng.uniform(0.01, 0.06, size=(len(enrolled), 1))
+    return np.concatenate([enrolled + rng.normal(size=enrolled.shape) * spread,
+                           rng.normal(0.0, 0.09, size=(count - len(enrolled), 128))])
+
+
+def matchers(known, names, dtypes, nprobe):
+    """(matcher, dtype, build) triples; build() returns (match function, gallery bytes)."""
+    def baseline():
+        references = [e for e in known]   # a list of float64 arrays, as load_known_faces used to return
+
+        def match(faces):
+            best_names, best_dists = [], []
+            for enc in faces:
+                dists = face_distance(references, enc)
+                best = int(np.argmin(dists))
+                best_names.append([names[best]])
+                best_dists.append([dists[best]])
+            return best_names, np.asarray(best_dists)
+        return match, sum(e.nbytes for e in references)
+
+    def gallery(dtype):
+        def build():
+            g = Gallery(known, names, dtype=dtype)
+            return g.match, g.nbytes
+        return build
+
+    def identities(dtype):
+        def build():
+            g = IdentityGallery.build(known, names)[0].quantize(dtype)
+            return g.match, g.nbytes
+        return build
+
+    def ivf():
+        index = IVFIndex.train(known, nprobe=nprobe)
+        index.add(known, names)
+        return index.match, index.nbytes()
+
+    out = [("face_distance", "float64", baseline)]
+    out += [("Gallery", dtype, gallery(dtype)) for dtype in dtypes]
+    out += [("IdentityGallery", dtype, identities(dtype)) for dtype in dtypes]
+    out.append(("IVFIndex", "float32", ivf))
+    return out
+
+
+def decisions(names, dists, threshold):
+    """Person matched by each face, or None when its best distance is not under threshold."""
+    return [person_name(n[0]) if len(d) and d[0] < threshold else None for n, d in zip(names, dists)]
+
+
+def run_cell(match, queries, faces, repeat, budget):
+    """Per-frame latencies (ms) over up to repeat frames of faces faces, stopping after budget seconds."""
+    match(queries[:faces])  # warm-up
+    latencies = []
+    deadline = time.perf_counter() + budget
+    for frame in range(repeat):
+        first = frame * faces % (len(queries) - faces + 1)
+        start = time.perf_counter()
+        match(queries[first:first + faces])
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        if len(latencies) >= 5 and time.perf_counter() > deadline:
+            break
+    return np.asarray(latencies)
+
+
+def calibrate(runs=7):
+    """Best time in ms of a fixed distance computation, a yardstick for how fast the machine is right now."""
+    rng = np.random.default_rng(0)
+    rows = rng.normal(size=(20_000, 128)).astype(np.float32)
+    face = rows[0] + 0.01
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        np.linalg.norm(rows - face, axis=1)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def match_peak_mib(match, queries, faces):
+    """Peak memory one match allocates on top of what is already held (separate pass: tracing slows it)."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    match(queries[:faces])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (peak - base) / 2**20
+
+
+def environment():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": revision, "python": platform.python_version(),
+            "numpy": np.__version__, "machine": platform.machine(), "system": platform.system(),
+            "cpus": os.cpu_count()}
+
+
+def compare(rows, path, tolerance, min_delta_ms):
+    """Print the p50 change of every cell also in the results at path; returns the regressed cells."""
+    with open(path, "r", encoding="utf-8") as f:
+        old = {tuple(r[k] for k in KEY): r for r in json.load(f)["results"]}
+    print(f"\nagainst {path}:")
+    pairs = [(row, old[tuple(row[k] for k in KEY)]) for row in rows if tuple(row[k] for k in KEY) in old]
+    # one factor for the whole run: the median keeps a single noisy calibration from skewing its cell;
+    # older result files have no calibration, so their times are compared as they are
+    ratios = [row["calib_ms"] / before["calib_ms"] for row, before in pairs if before.get("calib_ms")]
+    machine = float(np.median(ratios)) if ratios else 1.0
+    print(f"machine speed factor {machine:.2f}x (calibration time now / then)")
+    print(f"{'matcher':>16} {'dtype':>8} {'size':>8} {'faces':>5} {'old p50':>8} {'expected':>8} "
+          f"{'new p50':>8} {'change':>7}")
+    regressed = []
+    for row, before in pairs:
+        expected = before["p50_ms"] * machine
+        change = row["p50_ms"] / max(expected, 1e-9) - 1.0
+        flag = ""
+        if change > tolerance and row["p50_ms"] - expected > min_delta_ms:
+            regressed.append(row)
+            flag = "  SLOWER"
+        print(f"{row['matcher']:>16} {row['dtype']:>8} {row['size']:>8} {row['faces']:>5} "
+              f"{before['p50_ms']:>8.3f} {expected:>8.3f} {row['p50_ms']:>8.3f} "
+              f"{change:>+6.0%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matcher benchmark suite")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000], help='Gallery sizes')
+    parser.add_argument('--faces', type=int, nargs='+', default=[1, 4, 16], help='Faces per frame')
+    parser.add_argument('--dtypes', nargs='+', default=list(DTYPES), choices=DTYPES,
+                        help='Storage dtypes of Gallery and IdentityGallery')
+    parser.add_argument('--samples', type=int, default=4, help='Reference photos per person')
+    parser.add_argument('--probes', type=int, default=8, help='IVF lists scanned per face')
+    parser.add_argument('--threshold', type=float, default=0.5, help='Match threshold (DIST_THRESH)')
+    parser.add_argument('--repeat', type=int, default=50, help='Frames timed per cell and run')
+    parser.add_argument('--runs', type=int, default=3, help='Timing runs per cell; p50 is the best run')
+    parser.add_argument('--budget', type=float, default=3.0,
+                        help='Seconds per cell (split over the runs) after which timing stops')
+    parser.add_argument('--out', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier --out file to compare p50 latencies with')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='p50 slowdown reported as a regression')
+    parser.add_argument('--min-delta', type=float, default=0.1,
+                        help='p50 slowdown in ms below which a cell is never a regression')
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'matcher':>16} {'dtype':>8} {'size':>8} {'faces':>5} {'faces/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'MiB':>7} {'match MiB':>9} {'agree':>6}")
+    for size in args.sizes:
+        known, names = synthetic_gallery(size, args.samples)
+        queries = synthetic_faces(known, max(256, 2 * max(args.faces)))
+        reference = None
+        for matcher, dtype, build in matchers(known, names, args.dtypes, args.probes):
+            start = time.perf_counter()
+            match, nbytes = build()
+            build_s = time.perf_counter() - start
+            found_names, found_dists = match(queries)
+            found = decisions(found_names, found_dists, args.threshold)
+            if reference is None:
+                reference = found   # the baseline comes first
+            agree = np.mean([a == b for a, b in zip(found, reference)])
+            for faces in args.faces:
+                peak = match_peak_mib(match, queries, faces)
+                runs = [run_cell(match, queries, faces, args.repeat, args.budget / args.runs)
+                        for _ in range(max(1, args.runs))]
+                latencies = np.concatenate(runs)
+                row = {"matcher": matcher, "dtype": dtype, "size": size, "faces": faces,
+                       "frames": len(latencies),
+                       "faces_per_s": faces * len(latencies) / (latencies.sum() / 1000.0),
+                       "p50_ms": float(min(np.percentile(run, 50) for run in runs)),
+                       "p99_ms": float(np.percentile(latencies, 99)),
+                       "mean_ms": float(latencies.mean()),
+                       "build_s": build_s,
+                       "gallery_mib": nbytes / 2**20,
+                       "match_peak_mib": peak,
+                       "agree": float(agree),
+                       "calib_ms": calibrate()}
+                rows.append(row)
+                print(f"{matcher:>16} {dtype:>8} {size:>8} {faces:>5} {row['faces_per_s']:>9.0f} "
+                      f"{row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['gallery_mib']:>7.1f} "
+                      f"{peak:>9.2f} {agree:>6.1%}")
+            del match
+        print()
+
+    regressed = compare(rows, args.compare, args.tolerance, args.min_delta) if args.compare else []
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "settings": vars(args), "results": rows}, f, indent=1)
+        print(f"\n[OK] {len(rows)} results written to {args.out}")
+    if regressed:
+        print(f"\n[WARN] {len(regressed)} cells more than {args.tolerance:.0%} "
+              f"(and {args.min_delta * 1000:.0f} us) slower at p50")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Duty cycle and CPU saved by the motion gate over a recorded clip of the
+doorway, ideally a whole day of it.
+
+Every frame goes through a MotionGate running on clip time (frame index /
+clip frame rate), so the hold behaves as it would live while the clip
+is read as fast as possible. Recognition (conversion, detection,
+tracking and encoding) runs on every --sample-th frame the gate lets
+through and every --sample-th frame it skips; the mean CPU of each kind
+prices the rest, since recognizing a whole day frame by frame would take
+longer than the day. The report gives the duty cycle, the number of
+motion events, what the gate itself costs, and the CPU of recognizing
+every frame against recognizing only the gated ones, also per day.
+--out writes the numbers as JSON.
+
+    python benchmarks/bench_motion.py --clip doorway_day.mp4 --store src/reference_gallery [--hold 2] [--sample 30]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import cv2 as cv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from camera.sources import open_source, SEQUENCE_FPS
+from camera.buffers import reuse_buffer
+from face_detection.backends import make_detector, DETECTORS
+from face_detection.motion import MotionGate, METHODS
+from recognition.pipeline import recognize_tracked
+from recognition.store import GalleryStore
+from recognition.tracker import FaceTracker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Motion gate duty cycle and CPU saved over a recorded clip")
+    parser.add_argument('--clip', required=True, help='Video file or directory of frames of the doorway')
+    parser.add_argument('--store', default="reference_gallery", help='Gallery store directory')
+    parser.add_argument('--method', default="diff", choices=METHODS, help='Motion detection method')
+    parser.add_argument('--hold', type=float, default=2.0, help='Seconds recognized after the motion stops')
+    parser.add_argument('--min-area', type=float, default=0.01, help='Fraction of the frame that must change')
+    parser.add_argument('--sample', type=int, default=30, help='Recognize every N-th gated and skipped frame')
+    parser.add_argument('--threshold', type=float, default=0.5, help='Match threshold (DIST_THRESH)')
+    parser.add_argument('--scale', type=float, default=0.5, help='Frame scale for face detection')
+    parser.add_argument('--detector', default="hog", choices=sorted(DETECTORS), help='Face detector backend')
+    parser.add_argument('--out', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+    if args.sample < 1:
+        parser.error("--sample must be at least 1")
+
+    store = GalleryStore(args.store)
+    if not store.exists():
+        raise SystemExit(f"[ERROR] No gallery store in {args.store!r}; run generate_reference_encoding.py first.")
+    gallery = store.load_identity_gallery()[0]
+    detector = make_detector(args.detector)
+    cap = open_source(args.clip, fps=0)
+    if cap is None:
+        raise SystemExit(f"[ERROR] Cannot read {args.clip!r}")
+    clip_fps = cap.get(cv.CAP_PROP_FPS) or SEQUENCE_FPS
+
+    index = [0]
+    gate = MotionGate(args.hold, min_area=args.min_area, method=args.method, clock=lambda: index[0] / clip_fps)
+    tracker = FaceTracker(clock=gate.clock)
+    cpu = {True: 0.0, False: 0.0}       # recognition CPU of the sampled frames, gated in / skipped
+    sampled = {True: 0, False: 0}
+    seen = {True: 0, False: 0}
+    rgb = None
+    start = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        active = gate.check(frame)
+        seen[active] += 1
+        if (seen[active] - 1) % args.sample == 0:
+            t0 = time.thread_time()
+            rgb = reuse_buffer(rgb, frame)
+            cv.cvtColor(frame, cv.COLOR_BGR2RGB, dst=rgb)
+            recognize_tracked(rgb, gallery, args.threshold, tracker, detect_scale=args.scale, detector=detector)
+            cpu[active] += time.thread_time() - t0
+            sampled[active] += 1
+        index[0] += 1
+    cap.release()
+    elapsed = time.perf_counter() - start
+    if not index[0]:
+        raise SystemExit("[ERROR] No frames read.")
+
+    stats = gate.stats()
+    per_active = cpu[True] / sampled[True] if sampled[True] else 0.0
+    per_idle = cpu[False] / sampled[False] if sampled[False] else per_active
+    ungated = seen[True] * per_active + seen[False] * per_idle
+    gated = seen[True] * per_active + stats["gate_cpu_s"]
+    clip_s = index[0] / clip_fps
+    per_day = 86400.0 / clip_s
+    result = {
+        "frames": index[0],
+        "clip_fps": clip_fps,
+        "clip_hours": clip_s / 3600.0,
+        "duty_cycle": stats["duty_cycle"],
+        "motion_frames": stats["motion_frames"],
+        "segments": stats["segments"],
+        "gate_ms_per_frame": stats["gate_cpu_s"] / index[0] * 1000.0,
+        "recognize_ms_active": per_active * 1000.0,
+        "recognize_ms_idle": per_idle * 1000.0,
+        "ungated_cpu_s": ungated,
+        "gated_cpu_s": gated,
+        "cpu_saved_s": ungated - gated,
+        "saved": (ungated - gated) / ungated if ungated > 0 else 0.0,
+        "ungated_core_hours_per_day": ungated * per_day / 3600.0,
+        "gated_core_hours_per_day": gated * per_day / 3600.0,
+    }
+
+    print(f"[INFO] {index[0]} frames, {result['clip_hours']:.2f} h of clip at {clip_fps:.0f} FPS, "
+          f"replayed in {elapsed:.0f}s ({sampled[True] + sampled[False]} frames recognized)")
+    print(f"{'':>12} {'frames':>9} {'share':>6} {'ms/frame':>9}")
+    print(f"{'gated in':>12} {seen[True]:>9} {result['duty_cycle']:>6.1%} {result['recognize_ms_active']:>9.1f}")
+    print(f"{'skipped':>12} {seen[False]:>9} {1 - result['duty_cycle']:>6.1%} {result['recognize_ms_idle']:>9.1f}")
+    print(f"{'gate':>12} {index[0]:>9} {'':>6} {result['gate_ms_per_frame']:>9.2f}")
+    print(f"\n{stats['segments']} motion events, hold {args.hold:.1f}s, method {args.method}")
+    print(f"CPU without the gate {ungated:.0f}s, with it {gated:.0f}s: {result['saved']:.0%} saved "
+          f"({result['ungated_core_hours_per_day']:.2f} -> {result['gated_core_hours_per_day']:.2f} "
+          f"core-hours per day)")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": result}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+CPU and memory of two doors served by two processes (the current
+`main.py --door main` + `main.py --door back` setup) against one
+multi_door.py process with a shared gallery and detector pool.
+
+Each door is a looping synthetic camera at 30 FPS showing --image (or
+the first frames of --video, or noise). Every setup runs for --seconds;
+the report sums CPU time and peak memory over its processes.
+
+    python benchmarks/bench_multi_door.py --image face.jpg [--seconds 20] [--gallery 10000]
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import subprocess
+import numpy as np
+import cv2 as cv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+class LoopCapture:
+    """Camera stand-in replaying a few frames at a fixed rate; fills image= like cv.VideoCapture."""
+
+    def __init__(self, frames, fps=30):
+        self.frames = frames
+        self.period = 1.0 / fps
+        self.count = 0
+
+    def read(self, image=None):
+        time.sleep(self.period)
+        src = self.frames[self.count % len(self.frames)]
+        self.count += 1
+        if image is None or image.shape != src.shape:
+            image = np.empty_like(src)
+        image[...] = src
+        return True, image
+
+    def release(self):
+        pass
+
+
+def load_frames(args):
+    if args.image:
+        img = cv.imread(args.image)
+        if img is None:
+            raise SystemExit(f"[ERROR] Cannot read {args.image}")
+        return [img]
+    if args.video:
+        cap = cv.VideoCapture(args.video)
+        frames = []
+        while len(frames) < 60:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        if frames:
+            return frames
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, size=(480, 640, 3), dtype=np.uint8) for _ in range(4)]
+
+
+def run_child(args):
+    """Serve --doors synthetic cameras in this process and print its usage as JSON."""
+    from multi_door import DoorStation
+    from recognition.gallery import Gallery
+    from face_detection.backends import make_detector
+    from face_detection.pool import DetectorPool
+    from utils.resources import process_usage
+
+    rng = np.random.default_rng(0)
+    gallery = Gallery(rng.normal(0.0, 0.09, size=(args.gallery, 128)), [str(i) for i in range(args.gallery)])
+    detector = DetectorPool(lambda: make_detector(args.detector), args.workers)
+    frames = load_frames(args)
+    matches = queue.Queue(maxsize=args.doors)
+    stations = [DoorStation(f"door{i}", LoopCapture(frames), gallery, detector, matches, args.scale).start()
+                for i in range(args.doors)]
+    deadline = time.monotonic() + args.seconds
+    while time.monotonic() < deadline:
+        try:
+            station, frame, _ = matches.get(timeout=0.1)
+            station.grabber.buffer.recycle(frame)
+        except queue.Empty:
+            pass
+    for station in stations:
+        station.stop()
+    cpu, peak = process_usage()
+    print(json.dumps({"cpu": cpu, "peak": peak, "frames": [s.stats()["taken"] for s in stations]}))
+
+
+def spawn(args, doors, workers):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--doors", str(doors), "--workers", str(workers),
+           "--seconds", str(args.seconds), "--gallery", str(args.gallery), "--detector", args.detector,
+           "--scale", str(args.scale)]
+    if args.image:
+        cmd += ["--image", args.image]
+    elif args.video:
+        cmd += ["--video", args.video]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+
+
+def collect(procs):
+    results = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two processes vs one multi-door process")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--image', help='Image every synthetic camera shows')
+    source.add_argument('--video', help='Video whose first frames the synthetic cameras loop')
+    parser.add_argument('--seconds', type=float, default=20.0, help='Run time per setup')
+    parser.add_argument('--gallery', type=int, default=10_000, help='Synthetic gallery size')
+    parser.add_argument('--detector', default="hog", help='Face detector backend')
+    parser.add_argument('--scale', type=float, default=0.5, help='Frame scale for face detection')
+    parser.add_argument('--workers', type=int, default=2, help='Detector pool size of the multi-door process')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--doors', type=int, default=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    setups = [("2 processes", collect([spawn(args, 1, 1), spawn(args, 1, 1)])),
+              ("multi_door", collect([spawn(args, 2, args.workers)]))]
+    print(f"{'setup':>12} {'processes':>9} {'CPU s':>7} {'CPU %':>6} {'peak MiB':>9} {'FPS per door':>13}")
+    for name, results in setups:
+        cpu = sum(r["cpu"] for r in results)
+        peaks = [r["peak"] for r in results]
+        peak = f"{sum(peaks):.0f}" if None not in peaks else "n/a"
+        fps = [n / args.seconds for r in results for n in r["frames"]]
+        print(f"{name:>12} {len(results):>9} {cpu:>7.1f} {cpu / args.seconds * 100:>5.0f}% {peak:>9} "
+              f"{' / '.join(f'{f:.1f}' for f in fps):>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Accuracy, memory and match time of float16 and int8 gallery storage
+against full precision, on synthetic 128-d encodings.
+
+Half of the faces are noisy samples of enrolled people and half are
+strangers, with the noise spread so many distances land near the
+threshold. A decision is the matched name, or no match when the best
+distance is at or above --threshold (DIST_THRESH in main.py); the
+report counts how many decisions differ from the float64 reference.
+
+    python benchmarks/bench_quantization.py [--size 100000] [--faces 2000] [--threshold 0.5]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from recognition.gallery import Gallery, DTYPES
+
+
+def decisions(names, dists, threshold):
+    return [n[0] if d[0] < threshold else None for n, d in zip(names, dists)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized gallery benchmark")
+    parser.add_argument('--size', type=int, default=100_000, help='Enrolled encodings')
+    parser.add_argument('--faces', type=int, default=2000, help='Query faces')
+    parser.add_argument('--threshold', type=float, default=0.5, help='Match threshold (DIST_THRESH)')
+    parser.add_argument('--batch', type=int, default=4, help='Faces per frame when timing')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    known = rng.normal(0.0, 0.09, size=(args.size, 128))
+    names = [str(i) for i in range(args.size)]
+    enrolled = known[rng.integers(args.size, size=args.faces // 2)]
+    spread = rng.uniform(0.01, 0.06, size=(len(enrolled), 1))
+    faces = np.concatenate([enrolled + rng.normal(size=enrolled.shape) * spread,
+                            rng.normal(0.0, 0.09, size=(args.faces - len(enrolled), 128))])
+
+    # float64 reference, the precision face_recognition.face_distance works in
+    ref_dists = np.empty(len(faces))
+    ref_names = []
+    for i, face in enumerate(faces):
+        d = np.linalg.norm(known - face, axis=1)
+        best = int(np.argmin(d))
+        ref_dists[i] = d[best]
+        ref_names.append([names[best]])
+    reference = decisions(ref_names, ref_dists[:, None], args.threshold)
+    near = np.mean(np.abs(ref_dists - args.threshold) < 0.02)
+    print(f"{args.size} encodings, {len(faces)} faces, "
+          f"{np.mean([r is not None for r in reference]):.0%} matches at threshold {args.threshold}, "
+          f"{near:.1%} of best distances within 0.02 of it")
+    f64_mib = known.nbytes / 2**20 * 100_000 / args.size
+    print(f"\n{'storage':>8} {'MiB/100k':>9} {'vs f64':>7} {'changed':>8} {'max |dd|':>9} {'ms/frame':>9}")
+    print(f"{'float64':>8} {f64_mib:>9.1f} {1.0:>6.1f}x {0:>8} {0.0:>9.5f} {'-':>9}")
+    for dtype in DTYPES:
+        gallery = Gallery(known, names, dtype=dtype)
+        found, dists = gallery.match(faces, k=1)
+        changed = sum(a != b for a, b in zip(decisions(found, dists, args.threshold), reference))
+        err = np.max(np.abs(dists[:, 0] - ref_dists))
+
+        frames = [faces[i:i + args.batch] for i in range(0, min(len(faces), 40 * args.batch), args.batch)]
+        gallery.match(frames[0])  # warm-up
+        start = time.perf_counter()
+        for frame in frames:
+            gallery.match(frame)
+        ms = (time.perf_counter() - start) * 1000.0 / len(frames)
+
+        mib = gallery.nbytes / 2**20 * 100_000 / args.size
+        print(f"{dtype:>8} {mib:>9.1f} {f64_mib / mib:>6.1f}x {changed:>8} {err:>9.5f} {ms:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,34 @@
-import face_recognition
-import pickle
+"""
+Enroll reference images into the gallery store used by src/main.py.
+
+Images come from a directory (searched recursively), a manifest file
+with one image path per line, or the default list below. Encoding is
+fanned out over a process pool; results are checkpointed in chunks so an
+interrupted run resumes where it stopped, and images already in the
+store with unchanged files are not encoded again. Enrollment only adds
+to the store: the directory or manifest is remembered there, so
+src/main.py keeps its images when it syncs its own reference list.
+
+    python generate_reference_encoding.py --dir photos/ [--workers 4]
+    python generate_reference_encoding.py --manifest enroll.txt
+
+Photos in a directory tree are grouped into people by folder
+(photos/Nour/001.jpg is Nour); a manifest line may name the person
+after a tab. Only the default list is grouped by file name.
+"""
 import os
+import sys
+import glob
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
-# 1) List all of your reference image paths
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from recognition.store import GalleryStore, content_hash, encode_image, ENCODING_PARAMS
+from utils.image_processing import iter_labelled_paths
+
+# 1) Default reference image paths when no --dir or --manifest is given
 reference_image_paths = [
     r"A:\College stuff\DATA AQ\Nour1.jpg",
     r"A:\College stuff\DATA AQ\Nour.jpg",
@@ -11,31 +37,128 @@ reference_image_paths = [
     r"A:\College stuff\DATA AQ\Fares1.jpg"
 ]
 
-known_encodings = []
-known_names     = []
-
-# 2) Loop through each image, load it, find its face encoding, and grab a label
-for img_path in reference_image_paths:
-    # Derive a simple name from the filename (without extension)
-    name = os.path.splitext(os.path.basename(img_path))[0]
-    image = face_recognition.load_image_file(img_path)
-    encodings = face_recognition.face_encodings(image)
-
-    if not encodings:
-        print(f"[WARNING] no face found in {img_path!r}")
-        continue
-
-    # We’ll just take the first encoding per image
-    known_encodings.append(encodings[0])
-    known_names.append(name)
-    print(f"[OK]   loaded {name!r}")
-
-# 3) Save both lists into one pickle file
-data = {
-    "encodings": known_encodings,
-    "names":     known_names
-}
-with open("reference_encodings.pkl", "wb") as f:
-    pickle.dump(data, f)
-
-print(f"\nSaved {len(known_encodings)} encodings to 'reference_encodings.pkl'.")
+CHUNK_SIZE       = 256                  # images per checkpoint
+CHECKPOINT_DIR   = "enroll_checkpoint"  # inside the store directory
+
+
+def list_images(args):
+    """(path, label) pairs; the default list is labelled by sync() from the file names."""
+    if args.dir or args.manifest:
+        return iter_labelled_paths(args.dir or args.manifest)
+    return [(path, None) for path in reference_image_paths]
+
+
+def encode_one(path):
+    """Worker: (path, content hash, encoding or None, size, mtime_ns)."""
+    st = os.stat(path)
+    return path, content_hash(path), encode_image(path, ENCODING_PARAMS), st.st_size, st.st_mtime_ns
+
+
+def load_checkpoints(directory):
+    """Results of earlier, interrupted runs keyed by path."""
+    done = {}
+    for chunk in sorted(glob.glob(os.path.join(directory, "chunk_*.npz"))):
+        data = np.load(chunk, allow_pickle=False)
+        for path, key, enc, ok, size, mtime in zip(data["paths"], data["hashes"], data["encodings"],
+                                                   data["ok"], data["sizes"], data["mtimes"]):
+            done[str(path)] = (str(key), enc if ok else None, int(size), int(mtime))
+    return done
+
+
+def save_checkpoint(directory, number, results):
+    os.makedirs(directory, exist_ok=True)
+    encs = np.zeros((len(results), 128), dtype=np.float32)
+    for i, (_, _, enc, _, _) in enumerate(results):
+        if enc is not None:
+            encs[i] = enc
+    tmp = os.path.join(directory, f"chunk_{number:06d}.tmp.npz")
+    np.savez(tmp,
+             paths=np.array([r[0] for r in results]),
+             hashes=np.array([r[1] for r in results]),
+             encodings=encs,
+             ok=np.array([r[2] is not None for r in results]),
+             sizes=np.array([r[3] for r in results], dtype=np.int64),
+             mtimes=np.array([r[4] for r in results], dtype=np.int64))
+    os.replace(tmp, os.path.join(directory, f"chunk_{number:06d}.npz"))
+
+
+def up_to_date(path, stats):
+    """True when the path is already in the store (or known faceless) with the same file."""
+    prev = stats.get(path)
+    if prev is None:
+        return False
+    st = os.stat(path)
+    return prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enroll reference faces")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--dir', help='Directory of reference images (searched recursively)')
+    source.add_argument('--manifest', help='Text file with one image path per line')
+    parser.add_argument('--store', default="reference_gallery", help='Gallery store directory')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Encoding processes')
+    args = parser.parse_args()
+
+    paths, labels = [], {}
+    for path, label in list_images(args):
+        if os.path.exists(path):
+            path = os.path.abspath(path)   # the store keeps absolute paths
+            paths.append(path)
+            if label:
+                labels[path] = label
+        else:
+            print(f"[WARNING] missing {path!r}")
+
+    # 2) Work out what actually needs encoding
+    store = GalleryStore(args.store)
+    index = store.read_index()
+    stats = {e["path"]: e for e in index["entries"]}
+    stats.update(index.get("skipped", {}))
+    checkpoint_dir = os.path.join(args.store, CHECKPOINT_DIR)
+    done = load_checkpoints(checkpoint_dir)
+    todo = []
+    for path in paths:
+        if up_to_date(path, stats):
+            continue
+        prev = done.get(path)
+        if prev is not None:
+            st = os.stat(path)
+            if prev[2] == st.st_size and prev[3] == st.st_mtime_ns:
+                continue
+        todo.append(path)
+    print(f"[INFO] {len(paths)} images: {len(paths) - len(todo)} already encoded, {len(todo)} to encode "
+          f"on {args.workers} workers")
+
+    # 3) Encode in parallel, checkpointing every chunk
+    start = time.perf_counter()
+    chunk_number = len(glob.glob(os.path.join(checkpoint_dir, "chunk_*.npz")))
+    processed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for first in range(0, len(todo), CHUNK_SIZE):
+            chunk = todo[first:first + CHUNK_SIZE]
+            results = list(pool.map(encode_one, chunk, chunksize=max(1, len(chunk) // (4 * args.workers))))
+            save_checkpoint(checkpoint_dir, chunk_number, results)
+            chunk_number += 1
+            for path, key, enc, size, mtime in results:
+                done[path] = (key, enc, size, mtime)
+            processed += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"[OK]   {processed}/{len(todo)} encoded ({processed / elapsed:.1f} images/s)")
+
+    # 4) Merge everything into the store and drop the checkpoints
+    precomputed = {key: enc for key, enc, _, _ in done.values()}
+    if args.dir or args.manifest:
+        store.add_source(args.dir or args.manifest)
+    encoded, reused, evicted = store.sync(paths, precomputed=precomputed, evict=False, labels=labels)
+    for chunk in glob.glob(os.path.join(checkpoint_dir, "chunk_*.npz")):
+        os.remove(chunk)
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"\nSaved {encoded + reused} encodings to '{args.store}' "
+          f"({encoded} new, {reused} reused, {evicted} evicted) - {rate:.1f} images/s.")
+
+
+if __name__ == '__main__':
+    main()
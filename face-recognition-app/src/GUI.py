@@ -7,19 +7,26 @@ import sounddevice as sd
 import queue
 import json
 import threading
+import asyncio
 from vosk import Model, KaldiRecognizer
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
     QWidget, QGridLayout, QFrame
 )
 from PyQt5.QtGui import QPixmap, QIcon
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 
 # Add this import for the AnimatedToggle
 from animated_toggle import AnimatedToggle  # Save the AnimatedToggle class in a file named animated_toggle.py
+from recognizer_client import RecognizerClient
+
+FACEID_TIMEOUT = 30  # seconds the recognizer service looks for a known face
 
 
 class SmartHomeApp(QMainWindow):
+    # Emitted from the Face ID worker thread with (door, reply)
+    faceid_result = pyqtSignal(str, object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Smart Home Control Panel")
@@ -300,6 +307,11 @@ class SmartHomeApp(QMainWindow):
         self.speech_thread.start()
         print("Voice control activated. Say commands to control your smart home.")
 
+        # Face ID requests go to the warm recognizer service
+        self.faceid_client = RecognizerClient()
+        self.faceid_busy = False
+        self.faceid_result.connect(self.handle_faceid_result)
+
         # Add these variables for state collection
         self.collecting_states = False
         self.collected_states = []
@@ -1081,29 +1093,7 @@ class SmartHomeApp(QMainWindow):
     def handle_faceid_button(self):
         """Handle the Face ID button click."""
         print("Face ID scan initiated.")
-        
-        # Close the serial connection first
-        if self.serial_port:
-            self.serial_port.close()
-            self.serial_port = None
-        
-        try:
-            subprocess.run(["python", r"A:\College stuff\DATA AQ\face-recognition-app\src\main.py"])
-        except Exception as e:
-            print(f"Error running face recognition script: {e}")
-        
-        # Reopen the serial connection after main.py completes
-        for attempt in range(3):  # Try 3 times
-            try:
-                self.serial_port = serial.Serial('COM6', 9600, timeout=1)
-                print("Serial port reopened successfully")
-                break
-            except serial.SerialException:
-                print(f"Error: Could not reopen serial port (Attempt {attempt+1}/3)")
-                time.sleep(1)  # Wait a bit before retrying
-                
-        if self.serial_port is None:
-            print("Failed to reopen serial port after multiple attempts")
+        self.start_faceid("main")
 
     def handle_kitchen_aircon_toggle(self, state):
         """Handle the toggle state of the Kitchen Air Conditioner."""
@@ -1228,17 +1218,47 @@ class SmartHomeApp(QMainWindow):
 
     def handle_faceid_backdoor_button(self):
         """Handle the Face ID Back Door button click."""
-
         print("Face ID scan for back door initiated.")
-        
+        self.start_faceid("back")
+
+    def start_faceid(self, door):
+        """Ask the recognizer service for a match without blocking the Qt thread."""
+        if self.faceid_busy:
+            print("Face ID scan already in progress.")
+            return
+        self.faceid_busy = True
+        threading.Thread(target=self.run_faceid_request, args=(door,), daemon=True).start()
+
+    def run_faceid_request(self, door):
+        """Await the recognizer service on a worker thread and report back through a signal."""
+        try:
+            reply = asyncio.run(self.faceid_client.recognize(door, FACEID_TIMEOUT))
+        except (OSError, ConnectionError, asyncio.TimeoutError) as e:
+            reply = {"ok": False, "door": door, "reason": "unavailable", "error": str(e)}
+        self.faceid_result.emit(door, reply)
+
+    def handle_faceid_result(self, door, reply):
+        """Send the door command for a Face ID reply (runs on the Qt thread)."""
+        self.faceid_busy = False
+        if reply.get("ok"):
+            print(f"Face ID match: {reply['name']} in {reply['elapsed']:.2f}s")
+            self.send_command("OPEN_BACK_DOOR" if door == "back" else "MATCH_FOUND")
+        elif reply.get("reason") == "unavailable":
+            print(f"Recognizer service unavailable ({reply.get('error')}), running main.py instead.")
+            self.run_faceid_script(door)
+        else:
+            print(f"Face ID failed: {reply.get('reason')}")
+            self.send_command("NO_MATCH")
+
+    def run_faceid_script(self, door):
+        """Fallback: run main.py in a new process when the recognizer service is not running."""
         # Close the serial connection first
         if self.serial_port:
             self.serial_port.close()
             self.serial_port = None
         
         try:
-            # Run face recognition with a parameter to indicate back door
-            subprocess.run(["python", r"A:\College stuff\DATA AQ\face-recognition-app\src\main.py", "--door=back"])
+            subprocess.run(["python", r"A:\College stuff\DATA AQ\face-recognition-app\src\main.py", f"--door={door}"])
         except Exception as e:
             print(f"Error running face recognition script: {e}")
         
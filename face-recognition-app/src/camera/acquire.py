@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import cv2 as cv
+
+CameraInfo = namedtuple("CameraInfo", ["index", "backend", "open_s", "warmup_s", "warmup_frames"])
+
+SETTLE_FRAMES  = 3      # consecutive steady frames that end warm-up
+SETTLE_DELTA   = 2.0    # max change in mean brightness (0-255) between steady frames
+MIN_BRIGHTNESS = 8.0    # frames darker than this are still the sensor starting up
+MAX_WARMUP_S   = 3.0
+READ_RETRY_S   = (0.01, 0.1)   # first and longest wait after a failed read during warm-up, doubling
+
+
+def platform_backends():
+    """Capture backends to try on this platform, preferred first, as (name, cv api) pairs."""
+    if sys.platform == "win32":
+        return [("dshow", cv.CAP_DSHOW), ("msmf", cv.CAP_MSMF)]
+    if sys.platform.startswith("linux"):
+        return [("v4l2", cv.CAP_V4L2), ("any", cv.CAP_ANY)]
+    if sys.platform == "darwin":
+        return [("avfoundation", cv.CAP_AVFOUNDATION)]
+    return [("any", cv.CAP_ANY)]
+
+
+def configure(cap, backend, width=640, height=480):
+    """Frame size for every backend; on V4L2 also MJPG and a one-frame driver buffer, so reads are fresh."""
+    if backend == "v4l2":
+        cap.set(cv.CAP_PROP_FOURCC, cv.VideoWriter_fourcc(*"MJPG"))
+        cap.set(cv.CAP_PROP_BUFFERSIZE, 1)
+    cap.set(cv.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv.CAP_PROP_FRAME_HEIGHT, height)
+
+
+def try_open(index, backends, width=640, height=480):
+    """(cap, backend name) for the first backend that opens index and returns a frame, else (None, None)."""
+    for name, api in backends:
+        cap = cv.VideoCapture(index, api)
+        if cap.isOpened():
+            configure(cap, name, width, height)
+            ret, _ = cap.read()
+            if ret:
+                return cap, name
+        cap.release()
+    return None, None
+
+
+def _load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, cache):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+
+def open_first(indices, cache_path=None, width=640, height=480):
+    """
+    Open the first working camera of indices. The device and backend that
+    worked last time (remembered in cache_path) are tried first; otherwise
+    all candidates are probed at once and the earliest in indices wins.
+    A cached device that fails is dropped from the cache, so it is not
+    tried first again on every start while it stays unavailable.
+    Returns (cap, index, backend) or (None, None, None).
+    """
+    backends = platform_backends()
+    by_name = dict(backends)
+    key = ",".join(str(i) for i in indices)
+    cache = _load_cache(cache_path) if cache_path else {}
+    last = cache.get(key)
+    remaining = list(indices)
+    if last and last["index"] in remaining and last["backend"] in by_name:
+        cap, name = try_open(last["index"], [(last["backend"], by_name[last["backend"]])], width, height)
+        if cap is not None:
+            return cap, last["index"], name
+        print(f"[DEBUG] Cached camera {last['index']} ({last['backend']}) unavailable, probing")
+    if last is not None:
+        del cache[key]   # failed or no longer valid; re-added below if the probe finds a camera
+        _store_cache(cache_path, cache)
+
+    if not remaining:
+        return None, None, None
+    # one thread per device; backends are tried in order within a device
+    with ThreadPoolExecutor(max_workers=len(remaining)) as pool:
+        opened = list(pool.map(lambda idx: try_open(idx, backends, width, height), remaining))
+    chosen = None
+    for idx, (cap, name) in zip(remaining, opened):
+        if cap is None:
+            continue
+        if chosen is None:
+            chosen = (cap, idx, name)
+        else:
+            cap.release()
+    if chosen is None:
+        return None, None, None
+    cache[key] = {"index": chosen[1], "backend": chosen[2]}
+    _store_cache(cache_path, cache)
+    return chosen
+
+
+def _store_cache(cache_path, cache):
+    if not cache_path:
+        return
+    try:
+        _save_cache(cache_path, cache)
+    except OSError as e:
+        print(f"[WARN] Cannot save camera cache: {e}")
+
+
+def warm_up(cap, max_wait=MAX_WARMUP_S, settle_frames=SETTLE_FRAMES, settle_delta=SETTLE_DELTA):
+    """
+    Read frames until auto exposure has settled: mean brightness (and the
+    exposure property, where the backend reports one) stays within
+    settle_delta for settle_frames frames in a row. Failed reads are
+    retried after a short, growing wait instead of spinning a core.
+    Returns frames read.
+    """
+    deadline = time.monotonic() + max_wait
+    last = None
+    steady = frames = 0
+    retry = READ_RETRY_S[0]
+    while time.monotonic() < deadline:
+        ret, frame = cap.read()
+        if not ret:
+            time.sleep(min(retry, max(0.0, deadline - time.monotonic())))
+            retry = min(retry * 2, READ_RETRY_S[1])
+            continue
+        retry = READ_RETRY_S[0]
+        frames += 1
+        brightness = cv.mean(frame[::8, ::8])[:3]
+        level = sum(brightness) / 3.0
+        exposure = cap.get(cv.CAP_PROP_EXPOSURE)
+        if last is not None and level >= MIN_BRIGHTNESS \
+                and abs(level - last[0]) <= settle_delta and exposure == last[1]:
+            steady += 1
+            if steady >= settle_frames:
+                break
+        else:
+            steady = 0
+        last = (level, exposure)
+    return frames
+
+
+def acquire_camera(indices, cache_path=None, width=640, height=480, max_wait=MAX_WARMUP_S):
+    """open_first() then warm_up(); returns (cap, CameraInfo) or (None, None)."""
+    start = time.perf_counter()
+    cap, index, backend = open_first(indices, cache_path, width, height)
+    if cap is None:
+        return None, None
+    opened = time.perf_counter()
+    frames = warm_up(cap, max_wait)
+    return cap, CameraInfo(index, backend, opened - start, time.perf_counter() - opened, frames)
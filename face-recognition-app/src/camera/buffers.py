@@ -0,0 +1,39 @@
+import threading
+from collections import deque
+import numpy as np
+
+
+class FramePool:
+    """
+    Fixed set of preallocated frame arrays handed out and taken back in
+    FIFO order, so the capture loop can read into (cap.read(image=buf))
+    and convert into existing memory instead of allocating every frame.
+    """
+
+    def __init__(self, shape, dtype=np.uint8, count=4):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._free = deque(np.empty(self.shape, self.dtype) for _ in range(count))
+        self._lock = threading.Lock()
+        self.allocated = count   # grows only if every buffer is in use at once
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.popleft()
+            self.allocated += 1
+        return np.empty(self.shape, self.dtype)
+
+    def release(self, buf):
+        """Give a buffer back; arrays of another shape (e.g. after a resolution change) are dropped."""
+        if buf.shape != self.shape or buf.dtype != self.dtype:
+            return
+        with self._lock:
+            self._free.append(buf)
+
+
+def reuse_buffer(buf, like):
+    """Return buf if it can hold an array like `like`, else a new one (first frame or size change)."""
+    if buf is None or buf.shape != like.shape or buf.dtype != like.dtype:
+        return np.empty_like(like)
+    return buf
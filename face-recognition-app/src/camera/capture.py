@@ -0,0 +1,166 @@
+import time
+import threading
+
+from camera.buffers import FramePool
+from utils.timing import stage
+
+
+class LatestFrame:
+    """
+    One-slot frame buffer. put() always overwrites the slot, so a slow
+    consumer gets the newest frame instead of a queue of stale ones.
+
+    With a FramePool attached, frames are pool buffers: overwritten frames
+    go straight back to the pool, and a consumer hands a frame back with
+    recycle() once it is done with it.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self._cond = threading.Condition()
+        self._frame = None
+        self._recycled = False   # consumer is done with the frame still in the slot
+        self._stamp = 0.0
+        self._seq = 0
+        self._taken_seq = 0
+        self._closed = False
+        # counters
+        self.captured = 0
+        self.dropped = 0      # frames overwritten before get() took them
+        self.taken = 0
+        self.last_age = 0.0   # seconds between capture and get() of the last frame
+        self.total_age = 0.0
+        self.max_age = 0.0
+
+    def put(self, frame, stamp=None):
+        with self._cond:
+            old = self._frame
+            if self._seq > self._taken_seq:
+                self.dropped += 1
+                self._release(old)
+            elif self._recycled:
+                self._release(old)
+            self._recycled = False
+            self._frame = frame
+            self._stamp = time.monotonic() if stamp is None else stamp
+            self._seq += 1
+            self.captured += 1
+            self._cond.notify_all()
+
+    def peek(self):
+        """Newest frame (or None) without consuming it."""
+        with self._cond:
+            return self._frame
+
+    def copy_latest(self, dst):
+        """
+        Copy the newest frame into dst under the lock, so a recycled buffer
+        is never read while the grabber refills it; used for display.
+        Returns the frame's sequence number (0 when there is none yet).
+        """
+        with self._cond:
+            if self._frame is None:
+                return 0
+            dst[...] = self._frame
+            return self._seq
+
+    def recycle(self, frame):
+        """Hand a frame returned by get() back to the pool."""
+        with self._cond:
+            if frame is self._frame:
+                self._recycled = True   # still shown in the slot; released on the next put()
+            else:
+                self._release(frame)
+
+    def _release(self, frame):
+        if self.pool is not None and frame is not None:
+            self.pool.release(frame)
+
+    def get(self, timeout=None):
+        """
+        Wait for a frame newer than the last one returned and consume it.
+        Returns (frame, age_secs), or (None, 0.0) on timeout or close.
+        """
+        with self._cond:
+            ready = self._cond.wait_for(lambda: self._seq > self._taken_seq or self._closed, timeout)
+            if not ready or self._seq == self._taken_seq:
+                return None, 0.0
+            self._taken_seq = self._seq
+            age = time.monotonic() - self._stamp
+            self.taken += 1
+            self.last_age = age
+            self.total_age += age
+            self.max_age = max(self.max_age, age)
+            return self._frame, age
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def seq(self):
+        """Sequence number of the newest frame; changes whenever a frame is put."""
+        return self._seq
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stats(self):
+        mean_age = self.total_age / self.taken if self.taken else 0.0
+        return {
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "taken": self.taken,
+            "last_age_ms": self.last_age * 1000.0,
+            "mean_age_ms": mean_age * 1000.0,
+            "max_age_ms": self.max_age * 1000.0,
+        }
+
+
+class FrameGrabber:
+    """
+    Reads the camera on its own thread into a LatestFrame buffer. After
+    the first frame every read goes into a FramePool buffer, so the
+    steady-state capture loop does not allocate.
+    """
+
+    def __init__(self, cap, pool_size=4, timer=None):
+        self.cap = cap
+        self.pool_size = pool_size
+        self.timer = timer   # utils.timing.StageTimer for the "grab" stage, or None
+        self.buffer = LatestFrame()
+        self.failed = False
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        ret, frame = self.cap.read()
+        if ret:
+            self.buffer.pool = FramePool(frame.shape, frame.dtype, self.pool_size)
+            self.buffer.put(frame)
+        else:
+            self.failed = True
+        while self._running and not self.failed:
+            buf = self.buffer.pool.acquire()
+            with stage(self.timer, "grab"):
+                ret, frame = self.cap.read(image=buf)
+            if not ret:
+                self.buffer.pool.release(buf)
+                self.failed = True
+                break
+            self.buffer.put(frame)
+        self.buffer.close()
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.buffer.close()
@@ -0,0 +1,101 @@
+import os
+import time
+import cv2 as cv
+
+from utils.image_processing import iter_image_paths
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v", ".mjpeg")
+SEQUENCE_FPS = 30.0   # frame rate assumed for image sequences
+
+
+def is_video_file(source):
+    return os.path.isfile(source) and source.lower().endswith(VIDEO_EXTENSIONS)
+
+
+class ImageSequence:
+    """
+    cv.VideoCapture stand-in over a directory, glob or manifest of frames
+    (anything iter_image_paths accepts), read in name order. Like
+    VideoCapture it fills image= when given a buffer of the right shape.
+    """
+
+    def __init__(self, source, fps=SEQUENCE_FPS):
+        self.paths = iter_image_paths(source)
+        self.fps = fps
+        self._pos = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self, image=None):
+        while self._pos < len(self.paths):
+            path = self.paths[self._pos]
+            self._pos += 1
+            frame = cv.imread(path)
+            if frame is None:
+                print(f"[WARN] Cannot read frame {path}")
+                continue
+            if image is not None and image.shape == frame.shape:
+                image[...] = frame
+                return True, image
+            return True, frame
+        return False, None
+
+    def get(self, prop):
+        if prop == cv.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv.CAP_PROP_FRAME_COUNT:
+            return float(len(self.paths))
+        if prop == cv.CAP_PROP_POS_FRAMES:
+            return float(self._pos)
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.paths = []
+
+
+class PacedCapture:
+    """Replays a file source at fps, so it drops frames the way a live camera would."""
+
+    def __init__(self, cap, fps):
+        self.cap = cap
+        self.period = 1.0 / fps
+        self._next = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        now = time.monotonic()
+        if self._next is None or self._next < now:
+            self._next = now   # first frame, or the reader fell behind: no catch-up burst
+        else:
+            time.sleep(self._next - now)
+        self._next += self.period
+        return self.cap.read() if image is None else self.cap.read(image=image)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+
+def open_source(source, fps=None):
+    """
+    Capture over a recorded source: a video file, or a directory / glob /
+    manifest of frames. fps=None replays at the source's own frame rate,
+    fps=0 reads as fast as possible. Returns None if nothing can be read.
+    """
+    cap = cv.VideoCapture(source) if is_video_file(source) else ImageSequence(source)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    rate = (cap.get(cv.CAP_PROP_FPS) or SEQUENCE_FPS) if fps is None else fps
+    return PacedCapture(cap, rate) if rate > 0 else cap
@@ -0,0 +1,105 @@
+import os
+import cv2 as cv
+import dlib
+
+from face_detection.detector import FaceDetector
+
+# All backends take RGB frames and return boxes as (top, right, bottom, left),
+# the convention face_recognition.face_encodings expects.
+
+SRC_DIR        = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DNN_PROTOTXT   = os.path.join(SRC_DIR, "deploy.prototxt")
+DNN_MODEL      = os.path.join(SRC_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+DNN_INPUT_SIZE = (300, 300)
+DNN_MEAN       = (104.0, 177.0, 123.0)   # BGR means the res10 model was trained with
+
+
+class DetectorBackend:
+    """Base class: subclasses implement detect(); detect_batch() loops unless overridden."""
+    name = None
+
+    def detect(self, rgb):
+        raise NotImplementedError
+
+    def detect_batch(self, frames):
+        return [self.detect(rgb) for rgb in frames]
+
+
+class HogDetector(DetectorBackend):
+    """
+    dlib HOG detector, the one face_recognition.face_locations uses. Each
+    instance has its own dlib detector instead of face_recognition's
+    shared global, so pooled instances can detect at the same time.
+    """
+    name = "hog"
+
+    def __init__(self, upsample=1):
+        self.upsample = upsample
+        self.detector = dlib.get_frontal_face_detector()
+
+    def detect(self, rgb):
+        height, width = rgb.shape[:2]
+        return [(max(r.top(), 0), min(r.right(), width), min(r.bottom(), height), max(r.left(), 0))
+                for r in self.detector(rgb, self.upsample)]
+
+
+class HaarDetector(DetectorBackend):
+    """OpenCV Haar cascade from face_detection.detector.FaceDetector."""
+    name = "haar"
+
+    def __init__(self):
+        self.detector = FaceDetector()
+
+    def detect(self, rgb):
+        gray = cv.cvtColor(rgb, cv.COLOR_RGB2GRAY) if rgb.ndim == 3 else rgb
+        return [(int(y), int(x + w), int(y + h), int(x)) for (x, y, w, h) in self.detector.detect_faces(gray)]
+
+
+class DnnDetector(DetectorBackend):
+    """
+    res10 300x300 SSD through cv.dnn. detect_batch() puts all frames in
+    one blobFromImages call, so several frames or cameras share a single
+    forward pass.
+    """
+    name = "dnn"
+
+    def __init__(self, prototxt=DNN_PROTOTXT, model=DNN_MODEL, confidence=0.5):
+        if not os.path.exists(model):
+            raise IOError(f"DNN face model not found at {model}")
+        self.net = cv.dnn.readNetFromCaffe(prototxt, model)
+        self.confidence = confidence
+
+    def detect(self, rgb):
+        return self.detect_batch([rgb])[0]
+
+    def detect_batch(self, frames):
+        if not frames:
+            return []
+        # swapRB turns our RGB frames into the BGR order the model expects
+        blob = cv.dnn.blobFromImages(frames, 1.0, DNN_INPUT_SIZE, DNN_MEAN, swapRB=True, crop=False)
+        self.net.setInput(blob)
+        detections = self.net.forward().reshape(-1, 7)
+        boxes = [[] for _ in frames]
+        for image_id, _, conf, x1, y1, x2, y2 in detections:
+            if conf < self.confidence:
+                continue
+            height, width = frames[int(image_id)].shape[:2]
+            top, left = max(0, int(y1 * height)), max(0, int(x1 * width))
+            bottom, right = min(height, int(y2 * height)), min(width, int(x2 * width))
+            if bottom > top and right > left:
+                boxes[int(image_id)].append((top, right, bottom, left))
+        return boxes
+
+
+DETECTORS = {
+    HogDetector.name: HogDetector,
+    HaarDetector.name: HaarDetector,
+    DnnDetector.name: DnnDetector,
+}
+
+
+def make_detector(name, **kwargs):
+    """Build a detector backend by name: 'hog', 'haar' or 'dnn'."""
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector {name!r}, expected one of {sorted(DETECTORS)}")
+    return DETECTORS[name](**kwargs)
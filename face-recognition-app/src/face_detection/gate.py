@@ -0,0 +1,88 @@
+import time
+import cv2 as cv
+
+from face_detection.backends import DetectorBackend, HaarDetector, HogDetector
+
+
+def pad_box(box, pad, shape):
+    """Grow a (top, right, bottom, left) box by pad times its size on each side, clamped to the frame."""
+    top, right, bottom, left = box
+    dy, dx = int((bottom - top) * pad), int((right - left) * pad)
+    height, width = shape[:2]
+    return max(0, top - dy), min(width, right + dx), min(height, bottom + dy), max(0, left - dx)
+
+
+def merge_regions(boxes):
+    """Union overlapping boxes so no pixel is scanned twice."""
+    merged = []
+    for box in sorted(boxes):
+        for i, other in enumerate(merged):
+            if box[0] < other[2] and other[0] < box[2] and box[3] < other[1] and other[3] < box[1]:
+                merged[i] = (min(box[0], other[0]), max(box[1], other[1]),
+                             max(box[2], other[2]), min(box[3], other[3]))
+                break
+        else:
+            merged.append(box)
+    return merged
+
+
+class HaarGate(DetectorBackend):
+    """
+    Two-stage detector. The Haar cascade scans a downscaled grayscale
+    frame first; the expensive detector (HOG by default) then only runs on
+    padded regions around the Haar hits, and not at all when there are none.
+    """
+    name = "haar-gate"
+
+    def __init__(self, detector=None, pad=0.5, gate_scale=0.5):
+        self.gate = HaarDetector()
+        self.detector = detector or HogDetector()
+        self.pad = pad
+        self.gate_scale = gate_scale
+        # counters
+        self.frames = 0
+        self.rejected = 0
+        self.regions = 0
+        self.gate_cpu = 0.0
+        self.detect_cpu = 0.0
+        self.frame_pixels = 0
+        self.scanned_pixels = 0
+
+    def detect(self, rgb):
+        self.frames += 1
+        self.frame_pixels += rgb.shape[0] * rgb.shape[1]
+        start = time.thread_time()
+        small = cv.resize(rgb, (0, 0), fx=self.gate_scale, fy=self.gate_scale, interpolation=cv.INTER_AREA)
+        hits = [tuple(int(round(v / self.gate_scale)) for v in box) for box in self.gate.detect(small)]
+        self.gate_cpu += time.thread_time() - start
+        if not hits:
+            self.rejected += 1
+            return []
+
+        start = time.thread_time()
+        boxes = []
+        for (top, right, bottom, left) in merge_regions([pad_box(b, self.pad, rgb.shape) for b in hits]):
+            self.regions += 1
+            self.scanned_pixels += (bottom - top) * (right - left)
+            crop = rgb[top:bottom, left:right]
+            for (t, r, b, l) in self.detector.detect(crop):
+                boxes.append((t + top, r + left, b + top, l + left))
+        self.detect_cpu += time.thread_time() - start
+        return boxes
+
+    def stats(self):
+        """
+        Gate counters. cpu_saved_s is an estimate: the pixels the second
+        stage never scanned, priced at its measured CPU cost per pixel,
+        minus what the Haar pass itself cost.
+        """
+        per_pixel = self.detect_cpu / self.scanned_pixels if self.scanned_pixels else 0.0
+        saved = (self.frame_pixels - self.scanned_pixels) * per_pixel - self.gate_cpu
+        return {
+            "frames": self.frames,
+            "rejected": self.rejected,
+            "regions": self.regions,
+            "gate_cpu_s": self.gate_cpu,
+            "detect_cpu_s": self.detect_cpu,
+            "cpu_saved_s": saved,
+        }
@@ -0,0 +1,102 @@
+import time
+import cv2 as cv
+
+METHODS = ("diff", "mog2")
+
+
+class MotionGate:
+    """
+    Decides per frame whether recognition should run at all. The frame is
+    shrunk to width pixels wide, grayed and blurred, then compared with a
+    background: a running average (method "diff") or OpenCV's MOG2
+    subtractor ("mog2"). When at least min_area of it changed, the gate
+    opens and stays open for hold seconds after the motion stops. Idle
+    frames cost one small resize and compare instead of conversion,
+    detection and encoding. One gate per camera; it keeps that camera's
+    background. clock gives the time in seconds (the clip time when
+    replaying a recording faster than real time).
+    """
+
+    def __init__(self, hold=2.0, width=160, min_area=0.01, pixel_thresh=25, alpha=0.05, method="diff",
+                 clock=time.monotonic):
+        if method not in METHODS:
+            raise ValueError(f"unknown motion method {method!r}, expected one of {METHODS}")
+        self.hold = hold
+        self.width = width
+        self.min_area = min_area
+        self.pixel_thresh = pixel_thresh
+        self.alpha = alpha
+        self.method = method
+        self.clock = clock
+        self._background = None
+        self._subtractor = (cv.createBackgroundSubtractorMOG2(history=500, varThreshold=pixel_thresh,
+                                                              detectShadows=False)
+                            if method == "mog2" else None)
+        self._last_motion = None
+        # counters
+        self.frames = 0
+        self.active = 0
+        self.motion_frames = 0
+        self.segments = 0
+        self.gate_cpu = 0.0
+        self.active_cpu = 0.0
+        self.active_measured = 0
+
+    def changed_fraction(self, frame):
+        """Fraction of the downscaled frame that differs from the background; updates the background."""
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, int(round(height * self.width / width))))
+        small = cv.resize(frame, size, interpolation=cv.INTER_AREA)
+        gray = cv.cvtColor(small, cv.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv.GaussianBlur(gray, (5, 5), 0)
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(gray)
+        else:
+            if self._background is None:
+                self._background = gray.astype("float32")
+                return 1.0   # nothing to compare with yet: treat as motion
+            diff = cv.absdiff(gray, cv.convertScaleAbs(self._background))
+            cv.accumulateWeighted(gray, self._background, self.alpha)
+            _, mask = cv.threshold(diff, self.pixel_thresh, 255, cv.THRESH_BINARY)
+        return cv.countNonZero(mask) / float(mask.size)
+
+    def check(self, frame):
+        """True when this BGR frame should be recognized: motion now or within the last hold seconds."""
+        self.frames += 1
+        start = time.thread_time()
+        moving = self.changed_fraction(frame) >= self.min_area
+        self.gate_cpu += time.thread_time() - start
+        now = self.clock()
+        was_open = self._last_motion is not None and now - self._last_motion <= self.hold
+        if moving:
+            self.motion_frames += 1
+            if not was_open:
+                self.segments += 1
+            self._last_motion = now
+        elif not was_open:
+            return False
+        self.active += 1
+        return True
+
+    def record(self, cpu_seconds):
+        """CPU time of recognizing one frame the gate let through, for the CPU saved estimate."""
+        self.active_cpu += cpu_seconds
+        self.active_measured += 1
+
+    def stats(self):
+        """
+        Gate counters. duty_cycle is the fraction of frames recognized;
+        cpu_saved_s prices each skipped frame at the mean measured CPU of
+        the recognized ones, minus what the gate itself cost.
+        """
+        per_frame = self.active_cpu / self.active_measured if self.active_measured else 0.0
+        return {
+            "frames": self.frames,
+            "active": self.active,
+            "motion_frames": self.motion_frames,
+            "segments": self.segments,
+            "duty_cycle": self.active / self.frames if self.frames else 0.0,
+            "gate_cpu_s": self.gate_cpu,
+            "active_cpu_s": self.active_cpu,
+            "cpu_saved_s": (self.frames - self.active) * per_frame - self.gate_cpu,
+        }
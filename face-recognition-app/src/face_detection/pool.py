@@ -0,0 +1,44 @@
+import queue
+
+from face_detection.backends import DetectorBackend
+
+
+class DetectorPool(DetectorBackend):
+    """
+    A fixed set of detector instances shared by several camera workers.
+    detect() borrows a free instance for the call, so the models are
+    loaded once per instance instead of once per camera, and at most
+    size detections run at the same time. The factory must return a new,
+    independent detector every call (every backend does); encoding is
+    serialized separately by recognition.pipeline.DLIB_LOCK.
+    """
+
+    def __init__(self, factory, size=2):
+        self.detectors = [factory() for _ in range(max(1, size))]
+        self.name = self.detectors[0].name
+        self._free = queue.Queue()
+        for detector in self.detectors:
+            self._free.put(detector)
+
+    def detect(self, rgb):
+        detector = self._free.get()
+        try:
+            return detector.detect(rgb)
+        finally:
+            self._free.put(detector)
+
+    def detect_batch(self, frames):
+        detector = self._free.get()
+        try:
+            return detector.detect_batch(frames)
+        finally:
+            self._free.put(detector)
+
+    def stats(self):
+        """Counters of the pooled detectors summed, for detectors that keep stats (e.g. HaarGate)."""
+        total = {}
+        for detector in self.detectors:
+            if hasattr(detector, "stats"):
+                for key, value in detector.stats().items():
+                    total[key] = total.get(key, 0) + value
+        return total
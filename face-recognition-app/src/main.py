@@ -1,11 +1,26 @@
 import os
 import time
-import pickle
-import numpy as np
+import queue
+import threading
 import cv2 as cv
-import face_recognition
 import serial
 import argparse  # Add this import
+from recognition.store import GalleryStore
+from recognition.pipeline import recognize_tracked
+from recognition.tracker import FaceTracker
+from recognition.quality import QualityController, describe
+from recognition.unknowns import UnknownClusters
+from recognition.reload import GalleryReloader
+from camera.capture import FrameGrabber
+from camera.acquire import acquire_camera
+from camera.sources import open_source
+from camera.buffers import reuse_buffer
+from face_detection.backends import make_detector, DETECTORS
+from face_detection.gate import HaarGate
+from face_detection.motion import MotionGate, METHODS
+from utils.resources import process_usage
+from utils.timing import StageTimer, stage
+from utils.evidence import EvidenceWriter
 
 # -----------------------------------------------------------------------------
 # CONFIGURATION
@@ -17,61 +32,215 @@ REFERENCE_IMAGE_PATHS = [
     r"A:\College stuff\DATA AQ\Abdo1.jpg",
     r"A:\College stuff\DATA AQ\Fares1.jpg",
 ]
-ENCODINGS_FILE = "reference_encodings.pkl"
+GALLERY_DIR    = "reference_gallery"   # content-addressed encoding store
+IDENTITY_GALLERY = True   # match against per-person centroids + exemplars
+GALLERY_DTYPE  = "float32"  # in-memory row storage: float32, float16 (2x smaller) or int8 (~4x smaller)
+ANN_INDEX      = False    # approximate IVF index over every reference image, for 100k+ galleries
+ANN_PROBES     = 8        # inverted lists scanned per face (more = better recall, slower)
 SERIAL_PORT    = 'COM6'
 BAUD_RATE      = 9600
 TIMEOUT_SECS   = 30       # seconds before automatic exit
 DIST_THRESH    = 0.5      # Euclidean distance threshold
 CAMERA_INDICES = [0, 1, 2, 3]   # webcam indices to try
+CAMERA_CACHE   = "camera_cache.json"   # last working camera index and backend
+DETECT_SCALE   = 1.0      # frame scale used for face detection (e.g. 0.5, 0.25)
+DETECTOR       = "hog"    # face detector backend: hog, haar or dnn
+EVIDENCE_DIR   = "evidence"   # annotated snapshot of every unlock and timeout, one folder per day
+EVIDENCE_MAX_MB = 500         # oldest snapshots are deleted beyond this
+UNKNOWNS_DIR   = "unknowns"   # clusters of faces that matched no one, see unknown_visitors.py
+ENROLLED_DIR   = "enrolled"   # photos enrolled from those clusters, added to REFERENCE_IMAGE_PATHS
+MOTION_HOLD_SECS = 2.0    # with --motion, keep recognizing this long after the motion stops
+GALLERY_RELOAD_SECS = 1.0  # how often the store is checked for a new gallery version; 0 = never
+FRAME_BUDGET_MS = 0       # adaptive quality target per frame (e.g. 100); 0 keeps the settings fixed
+DOOR_COMMANDS  = {"main": b"MATCH_FOUND\n", "back": b"OPEN_BACK_DOOR\n"}   # serial command per door
+DOOR_CAMERAS   = {"main": 0, "back": 1}   # camera index per door for multi_door.py
 # -----------------------------------------------------------------------------
 
-def load_known_faces(paths, cache_file):
+def reference_paths(paths=REFERENCE_IMAGE_PATHS, enrolled_dir=ENROLLED_DIR):
+    """paths plus the photos enrolled into enrolled_dir by unknown_visitors.py."""
+    if not os.path.isdir(enrolled_dir):
+        return list(paths)
+    return list(paths) + [os.path.join(enrolled_dir, name) for name in sorted(os.listdir(enrolled_dir))
+                          if name.lower().endswith(".jpg")]
+
+
+def load_known_faces(paths, store_dir):
     """
-    Builds (or loads) two parallel lists:
-      known_encodings, known_names
-    Uses cache_file for faster reloads.
+    Returns (gallery, reloader): a gallery memory-mapped from the encoding
+    store in store_dir, and the started GalleryReloader (None when
+    GALLERY_RELOAD_SECS is 0). The gallery is an approximate IVFIndex when
+    ANN_INDEX is set, one entry per person (IdentityGallery) when
+    IDENTITY_GALLERY is set, else one per reference image (Gallery).
+    The store is synced with paths (only new or changed images are
+    encoded, removed ones are evicted). When it already holds a version and
+    there is a reloader, that version is opened straight away and the sync
+    runs on a background thread, so start-up does not stat every reference;
+    the reloader swaps in what the sync writes. Otherwise the sync runs first.
     """
-    if os.path.exists(cache_file):
-        with open(cache_file, "rb") as f:
-            data = pickle.load(f)
-        print(f"[CACHE] Loaded {len(data['encodings'])} encodings from '{cache_file}'")
-        return data["encodings"], data["names"]
-
-    encs_list = []
-    names_list = []
-    for img_path in paths:
-        if not os.path.exists(img_path):
-            print(f"[WARN] Missing: {img_path}")
-            continue
-        img = cv.imread(img_path)
-        if img is None:
-            print(f"[WARN] cv.imread failed: {img_path}")
-            continue
-        rgb = cv.cvtColor(img, cv.COLOR_BGR2RGB)
-        encs = face_recognition.face_encodings(rgb)
-        if not encs:
-            print(f"[WARN] No face in: {img_path}")
+    store = GalleryStore(store_dir)
+    version = store.version()
+    if GALLERY_RELOAD_SECS <= 0 or version is None:
+        sync_store(store, paths)
+        gallery = open_gallery(store)
+        return gallery, gallery_reloader(gallery, store_dir)
+    gallery = open_gallery(store)
+    reloader = gallery_reloader(gallery, store_dir, version)
+    threading.Thread(target=sync_store, args=(store, paths), name="GallerySync", daemon=True).start()
+    return gallery, reloader
+
+
+def sync_store(store, paths):
+    """store.sync(paths) with the [CACHE] summary."""
+    try:
+        encoded, reused, evicted = store.sync(paths)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Gallery sync failed, keeping the current gallery: {e}")
+        return
+    print(f"[CACHE] {encoded + reused} encodings in '{store.directory}' "
+          f"({encoded} encoded, {reused} reused, {evicted} evicted)")
+
+
+def open_gallery(store):
+    """The gallery load_known_faces returns, from the store as it is (no sync)."""
+    if ANN_INDEX:
+        index, inserted, retrained = store.load_ann_index(nprobe=ANN_PROBES)
+        print(f"[CACHE] ANN index: {len(index)} samples in {len(index.centroids)} lists "
+              f"({'retrained' if retrained else f'{inserted} inserted'}, {ANN_PROBES} probes)")
+        return index
+    if not IDENTITY_GALLERY:
+        return store.load_gallery(GALLERY_DTYPE)
+    gallery, samples, rejected = store.load_identity_gallery(GALLERY_DTYPE)
+    print(f"[CACHE] {len(gallery)} identities from {samples} samples "
+          f"({rejected} near-duplicates rejected)")
+    return gallery
+
+
+def gallery_reloader(gallery, store_dir=GALLERY_DIR, version=None):
+    """
+    Started GalleryReloader for store_dir, or None when GALLERY_RELOAD_SECS
+    is 0. version is the store version gallery was opened from (default:
+    the current one).
+    """
+    if GALLERY_RELOAD_SECS <= 0:
+        return None
+    store = GalleryStore(store_dir)
+    return GalleryReloader(store, lambda: open_gallery(store), gallery, GALLERY_RELOAD_SECS, version).start()
+
+
+def open_camera(indices):
+    """
+    Open the first working webcam from indices at 640x480 and wait for its
+    exposure to settle, or return None. The device and backend that worked
+    last time are remembered in CAMERA_CACHE and tried first.
+    """
+    start = time.perf_counter()
+    cap, info = acquire_camera(indices, CAMERA_CACHE)
+    if cap is None:
+        return None
+    print(f"[INFO] Camera {info.index} ({info.backend}) first usable frame after "
+          f"{time.perf_counter() - start:.2f}s (open {info.open_s:.2f}s, "
+          f"warm-up {info.warmup_s:.2f}s over {info.warmup_frames} frames)")
+    return cap
+
+
+def recognition_worker(buffer, gallery, scale, detector, tracker, stop_event, matches, timer=None,
+                       quality=None, unknowns=None, reloader=None, motion=None):
+    """
+    Pull the newest frame from the capture buffer, recognize it and hand
+    the first match to the main thread. Frames that arrive while a frame
+    is being processed are dropped by the buffer. Faces are tracked, so
+    a face that stays in view is not re-encoded on every frame.
+    Frames are pool buffers and go back to the pool once processed.
+    timer, when given, gets the frame age and every pipeline stage.
+    quality, a QualityController, overrides scale and picks the upsample,
+    detection interval and landmark model from the measured frame times.
+    unknowns, an UnknownClusters, collects the faces that match no one.
+    reloader, a GalleryReloader, hands over new gallery versions; they are
+    picked up between frames and the tracks are re-verified against them.
+    motion, a MotionGate, skips frames of an empty doorway before any
+    conversion, detection or encoding.
+    """
+    rgb = None
+    version = None
+    idle = False
+    while not stop_event.is_set():
+        frame, age = buffer.get(timeout=0.2)
+        if frame is None:
+            if buffer.closed:
+                break
             continue
-        encs_list.append(encs[0])
-        name = os.path.splitext(os.path.basename(img_path))[0]
-        names_list.append(name)
-        print(f"[OK] Loaded '{name}'")
-    # cache
-    with open(cache_file, "wb") as f:
-        pickle.dump({"encodings":encs_list, "names":names_list}, f)
-    print(f"[SAVE] {len(encs_list)} encodings -> {cache_file}")
-    return encs_list, names_list
+        if reloader is not None and reloader.current[0] != version:
+            if version is not None:
+                tracker.invalidate()
+            version, gallery = reloader.current
+        if timer is not None:
+            timer.add("frame_age", age)
+        if motion is not None:
+            with stage(timer, "motion"):
+                moving = motion.check(frame)
+            if not moving:
+                idle = True
+                buffer.recycle(frame)
+                continue
+            if idle:
+                tracker.reset()   # whoever is at the door now is not who was tracked before the lull
+                idle = False
+            cpu_start = time.thread_time()
+        start = time.perf_counter()
+        detect, model = True, "small"
+        if quality is not None:
+            scale, model = quality.settings.scale, quality.settings.model
+            detect = quality.should_detect()
+        rgb = reuse_buffer(rgb, frame)
+        with stage(timer, "convert"):
+            cv.cvtColor(frame, cv.COLOR_BGR2RGB, dst=rgb)
+        results = recognize_tracked(rgb, gallery, DIST_THRESH, tracker, detect_scale=scale,
+                                    detector=detector, timer=timer, detect=detect, model=model,
+                                    unknowns=unknowns)
+        if quality is not None:
+            quality.record(time.perf_counter() - start)
+        if motion is not None:
+            motion.record(time.thread_time() - cpu_start)
+        for result in results:
+            if result.name is not None:
+                matches.put((frame, result))
+                return
+        buffer.recycle(frame)
 
 
 def main():
+    session_start = time.perf_counter()
     # Load/Cache reference
-    known_encodings, known_names = load_known_faces(REFERENCE_IMAGE_PATHS, ENCODINGS_FILE)
-    print(f"[INFO] References loaded: {known_names}")
+    gallery, reloader = load_known_faces(reference_paths(), GALLERY_DIR)
+    print(f"[INFO] References loaded: {gallery.names}")
 
     # Add command line paremeter parsing
     parser=argparse.ArgumentParser(description="Face Recognition door control")
-    parser.add_argument('--door', default='main', choices=['main', 'back'], help='Which door to control (main or back)')
+    parser.add_argument('--door', default='main', choices=sorted(DOOR_COMMANDS), help='Which door to control (main or back)')
+    parser.add_argument('--scale', type=float, default=DETECT_SCALE, help='Frame scale for face detection, e.g. 0.5 or 0.25')
+    parser.add_argument('--detector', default=DETECTOR, choices=sorted(DETECTORS), help='Face detector backend')
+    parser.add_argument('--gate', action='store_true', help='Run the detector only around Haar cascade hits')
+    parser.add_argument('--source', help='Video file or directory/glob of frames to use instead of the webcam')
+    parser.add_argument('--fps', type=float, help='Replay rate of --source (default: its own rate, 0 = unpaced)')
+    parser.add_argument('--headless', action='store_true', help='Do not open a window')
+    parser.add_argument('--timeout', type=float, default=TIMEOUT_SECS, help='Seconds before giving up')
+    parser.add_argument('--budget', type=float, default=FRAME_BUDGET_MS,
+                        help='Per-frame time budget in ms for adaptive quality (0 = fixed settings)')
+    parser.add_argument('--motion', nargs='?', const="diff", choices=METHODS,
+                        help='Recognize only while something moves (frame differencing, or mog2)')
+    parser.add_argument('--hold', type=float, default=MOTION_HOLD_SECS,
+                        help='Seconds to keep recognizing after the motion stops')
+    parser.add_argument('--no-evidence', action='store_true', help='Do not save snapshots of unlocks and timeouts')
+    parser.add_argument('--no-unknowns', action='store_true', help='Do not cluster faces that match no one')
+    parser.add_argument('--timing', action='store_true', help='Time every stage and print a report on exit')
+    parser.add_argument('--timing-prom', help='Also write the timings as a Prometheus text file')
+    parser.add_argument('--timing-jsonl', help='Also append the timings as one JSON line')
     args = parser.parse_args()
+    if not 0 < args.scale <= 1:
+        parser.error("--scale must be in (0, 1]")
+    detector = make_detector(args.detector)
+    if args.gate:
+        detector = HaarGate(detector)
 
 
     # Serial (optional)
@@ -81,87 +250,173 @@ def main():
         print(f"[WARN] Cannot open {SERIAL_PORT}")
         ser = None
 
-    # Open webcam
-    cap = None
-    for idx in CAMERA_INDICES:
-        print(f"[DEBUG] Trying camera index {idx}")
-        temp = cv.VideoCapture(idx, cv.CAP_DSHOW)
-        time.sleep(1)
-        if temp.isOpened():
-            cap = temp
-            print(f"[INFO] Camera opened on index {idx}")
-            break
-        temp.release()
-    if not cap:
-        print("[ERROR] No camera found. Exiting.")
-        return
+    # Open webcam, or the recorded source
+    if args.source:
+        cap = open_source(args.source, args.fps)
+        if not cap:
+            print(f"[ERROR] Cannot read {args.source!r}. Exiting.")
+            return
+    else:
+        cap = open_camera(CAMERA_INDICES)
+        if not cap:
+            print("[ERROR] No camera found. Exiting.")
+            return
 
-    cap.set(cv.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv.CAP_PROP_FRAME_HEIGHT, 480)
-    cv.namedWindow("Webcam Feed", cv.WINDOW_NORMAL)
-    print("[INFO] Camera warm-up...")
-    time.sleep(2)
+    if not args.headless:
+        cv.namedWindow("Webcam Feed", cv.WINDOW_NORMAL)
+
+    evidence = None if args.no_evidence else EvidenceWriter(EVIDENCE_DIR, EVIDENCE_MAX_MB * 2**20).start()
+    unknowns = None if args.no_unknowns else UnknownClusters.load(UNKNOWNS_DIR)
+    timer = StageTimer(started=session_start) if (args.timing or args.timing_prom or args.timing_jsonl) else None
+    if timer is not None:
+        timer.add("startup", time.perf_counter() - session_start)   # gallery load + camera open
+
+    # Capture on its own thread; display here at camera rate, recognition on a worker
+    grabber = FrameGrabber(cap, timer=timer).start()
+    stop_event = threading.Event()
+    matches = queue.Queue(maxsize=1)
+    tracker = FaceTracker()
+    motion = MotionGate(args.hold, method=args.motion) if args.motion else None
+    quality = QualityController(args.budget, detector) if args.budget > 0 else None
+    if quality is not None:
+        print(f"[QUALITY] {args.budget:.0f} ms budget, starting at level {quality.level}: "
+              f"{describe(quality.settings)}")
+    worker = threading.Thread(target=recognition_worker, name="Recognition",
+                              args=(grabber.buffer, gallery, args.scale, detector, tracker, stop_event, matches,
+                                    timer, quality, unknowns, reloader, motion),
+                              daemon=True)
+    if len(gallery) or reloader is not None:
+        worker.start()
 
     start_time = time.time()
+    frame_count = 0
+    last_seq = 0
+    display = None
     match_found = False
-    print("[INFO] Press 'q' to quit.")
+    if not args.headless:
+        print("[INFO] Press 'q' to quit.")
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        if grabber.failed and not args.source:
             print("[ERROR] Frame grab failed.")
             break
 
-        # Display frame
-        cv.imshow("Webcam Feed", frame)
-        key = cv.waitKey(1) & 0xFF
-        if key == ord('q'):
-            print("[INFO] 'q' pressed, quitting.")
-            break
+        # Display the newest frame, copied into a reused display buffer
+        if grabber.buffer.seq != last_seq:
+            if not args.headless:
+                display = reuse_buffer(display, grabber.buffer.peek())
+                last_seq = grabber.buffer.copy_latest(display)
+                cv.imshow("Webcam Feed", display)
+            else:
+                last_seq = grabber.buffer.seq
+            frame_count += 1
+        if not args.headless:
+            key = cv.waitKey(1) & 0xFF
+            if key == ord('q'):
+                print("[INFO] 'q' pressed, quitting.")
+                break
 
-        # Perform recognition
-        if known_encodings and not match_found:
-            rgb = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
-            locs = face_recognition.face_locations(rgb)
-            for (top, right, bottom, left) in locs:
-                encs = face_recognition.face_encodings(rgb, [(top, right, bottom, left)])
-                if not encs:
-                    continue
-                dists = face_recognition.face_distance(known_encodings, encs[0])
-                idx_min = np.argmin(dists)
-                if dists[idx_min] < DIST_THRESH:
-                    match_found = True
-                    name = known_names[idx_min]
-                    print(f"[INFO] Match found: {name}")
-                    if ser:
-                        # Check which door to control
-                        if args.door == 'back':
-                            ser.write(b"OPEN_BACK_DOOR\n",)
-                            print("[SERIAL] Sent: OPEN_BACK_DOOR")
-                            time.sleep(1)  # Wait for the door to open
-                        elif args.door == 'main':
-                            ser.write(b"MATCH_FOUND\n")
-                            print("[SERIAL] Sent: MATCH_FOUND")
-                            time.sleep(1)  # Add the same delay for main door
-                    # Draw rectangle and label
-                    cv.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                    cv.putText(frame, name, (left, top - 5), cv.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-                    cv.imshow("Webcam Feed", frame)
+        # Act on a match reported by the recognition worker
+        try:
+            frame, result = matches.get(timeout=0.01) if args.headless else matches.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            (top, right, bottom, left) = result.box
+            match_found = True
+            name = result.name
+            print(f"[INFO] Match found: {name} ({result.distance:.3f}) "
+                  f"{time.time() - start_time:.2f}s after start")
+            if evidence is not None:
+                evidence.submit(frame, "unlock", name, result.distance, args.door, result.box)
+            if ser:
+                command = DOOR_COMMANDS[args.door]
+                with stage(timer, "serial"):
+                    ser.write(command)
+                print(f"[SERIAL] Sent: {command.decode().strip()}")
+            if timer is not None:
+                timer.decide("match")
+            if ser:
+                with stage(timer, "door_wait"):
+                    time.sleep(1)  # Wait for the door to open
+            # Draw rectangle and label
+            if not args.headless:
+                cv.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+                cv.putText(frame, name, (left, top - 5), cv.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+                cv.imshow("Webcam Feed", frame)
+                with stage(timer, "show_match"):
                     cv.waitKey(500)
-                    break
 
-        # Check timeout or match
+        # Check timeout, match or end of the recorded source
         elapsed = time.time() - start_time
         if match_found:
             print("[INFO] Exiting after successful match.")
             break
-        if elapsed > TIMEOUT_SECS:
-            print("[INFO] No match within timeout.")
+        source_done = args.source and grabber.failed and not worker.is_alive() and matches.empty()
+        if elapsed > args.timeout or source_done:
+            print("[INFO] No match before the end of the source." if source_done else "[INFO] No match within timeout.")
+            if evidence is not None and grabber.buffer.peek() is not None:
+                snapshot = reuse_buffer(None, grabber.buffer.peek())
+                grabber.buffer.copy_latest(snapshot)
+                evidence.submit(snapshot, "timeout", door=args.door, copy=False)
             if ser:
-                ser.write(b"NO_MATCH\n")
+                with stage(timer, "serial"):
+                    ser.write(b"NO_MATCH\n")
+            if timer is not None:
+                timer.decide("no_match")
             break
 
+    stop_event.set()
+    grabber.stop()
+    if worker.is_alive():
+        worker.join(1.0)
+    if reloader is not None:
+        reloader.stop()
+
+    elapsed = time.time() - start_time
+    stats = grabber.buffer.stats()
+    if elapsed > 0:
+        print(f"[INFO] {frame_count} frames shown in {elapsed:.1f}s ({frame_count / elapsed:.1f} FPS), "
+              f"{stats['taken']} recognized ({stats['taken'] / elapsed:.1f} FPS, scale {args.scale})")
+    print(f"[STATS] captured={stats['captured']} dropped={stats['dropped']} "
+          f"frame age last={stats['last_age_ms']:.0f}ms mean={stats['mean_age_ms']:.0f}ms "
+          f"max={stats['max_age_ms']:.0f}ms")
+    if elapsed > 0:
+        print(f"[STATS] {tracker.encoded} faces encoded in {tracker.encode_calls} calls "
+              f"({tracker.encode_calls / elapsed:.1f} encode calls/s over {tracker.frame_no} frames)")
+    if args.gate:
+        gate = detector.stats()
+        print(f"[STATS] gate rejected {gate['rejected']}/{gate['frames']} frames, "
+              f"{gate['regions']} regions scanned, ~{gate['cpu_saved_s']:.1f}s CPU saved")
+    if motion is not None:
+        gate = motion.stats()
+        print(f"[STATS] motion gate: recognized {gate['active']}/{gate['frames']} frames "
+              f"({gate['duty_cycle']:.0%} duty cycle, {gate['segments']} motion events), "
+              f"gate {gate['gate_cpu_s']:.2f}s CPU, ~{gate['cpu_saved_s']:.1f}s CPU saved")
+    if evidence is not None:
+        evidence.close()
+        saved = evidence.stats()
+        print(f"[STATS] snapshots: {saved['written']} saved to '{EVIDENCE_DIR}', {saved['dropped']} dropped, "
+              f"{saved['evicted']} evicted")
+    if unknowns is not None:
+        unknowns.save()
+        print(f"[STATS] {unknowns.added} unmatched faces clustered, {len(unknowns)} unknown visitors "
+              f"in '{UNKNOWNS_DIR}'")
+    if quality is not None:
+        print(f"[STATS] quality changed {quality.changes} times, ended at level {quality.level}: "
+              f"{describe(quality.settings)}")
+    cpu, peak = process_usage()
+    peak_text = f"{peak:.0f} MiB" if peak is not None else "n/a"
+    print(f"[STATS] {cpu:.1f}s CPU, peak memory {peak_text} (one process per door)")
+    if timer is not None:
+        timer.report()
+        if args.timing_prom:
+            timer.write_prometheus(args.timing_prom)
+        if args.timing_jsonl:
+            timer.write_jsonl(args.timing_jsonl)
+
     cap.release()
-    cv.destroyAllWindows()
+    if not args.headless:
+        cv.destroyAllWindows()
     if ser:
         ser.close()
 
@@ -0,0 +1,265 @@
+"""
+Several doors from one process.
+
+Each camera gets its own capture thread and recognition worker, but the
+gallery is loaded once and detection runs on one shared pool of detector
+instances, so covering both doors no longer needs two copies of the model
+and gallery. A match on a camera sends that door's serial command
+(DOOR_COMMANDS in main.py); the doors keep running until 'q' or --duration.
+
+    python multi_door.py [--map main=0 back=1] [--scale 0.5] [--workers 2]
+"""
+import time
+import queue
+import argparse
+import threading
+import cv2 as cv
+import serial
+
+from main import (load_known_faces, open_camera, reference_paths, GALLERY_DIR, SERIAL_PORT, BAUD_RATE,
+                  DIST_THRESH, DETECT_SCALE, DETECTOR, DOOR_COMMANDS, DOOR_CAMERAS, EVIDENCE_DIR, EVIDENCE_MAX_MB,
+                  UNKNOWNS_DIR, MOTION_HOLD_SECS)
+from recognition.pipeline import recognize_tracked
+from recognition.tracker import FaceTracker
+from recognition.unknowns import UnknownClusters
+from camera.capture import FrameGrabber
+from camera.buffers import reuse_buffer
+from face_detection.backends import make_detector, DETECTORS
+from face_detection.gate import HaarGate
+from face_detection.motion import MotionGate, METHODS
+from face_detection.pool import DetectorPool
+from utils.resources import process_usage
+from utils.evidence import EvidenceWriter
+
+DOOR_COOLDOWN = 5.0   # seconds before the same door is sent another command
+UNKNOWNS_SAVE_SECS = 60.0   # how often the unknown-visitor clusters are written out
+
+
+def parse_mapping(items):
+    """['main=0', 'back=1'] -> {'main': 0, 'back': 1}"""
+    mapping = {}
+    for item in items:
+        door, sep, camera = item.partition("=")
+        if not sep or door not in DOOR_COMMANDS or not camera.isdigit():
+            raise ValueError(f"bad door mapping {item!r}, expected DOOR=CAMERA_INDEX "
+                             f"with DOOR one of {sorted(DOOR_COMMANDS)}")
+        mapping[door] = int(camera)
+    return mapping
+
+
+class DoorStation:
+    """One camera feeding one door: a capture thread plus a recognition worker."""
+
+    def __init__(self, door, cap, gallery, detector, matches, scale=DETECT_SCALE, unknowns=None, reloader=None,
+                 motion=None):
+        self.door = door
+        self.cap = cap
+        self.gallery = gallery
+        self.detector = detector
+        self.matches = matches
+        self.scale = scale
+        self.unknowns = unknowns
+        self.reloader = reloader
+        self.motion = motion
+        self.tracker = FaceTracker()
+        self.grabber = FrameGrabber(cap)
+        self.display = None
+        self.last_seq = 0
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name=f"Recognition-{door}", daemon=True)
+
+    def start(self):
+        self.grabber.start()
+        if len(self.gallery) or self.reloader is not None:
+            self._worker.start()
+        return self
+
+    def _run(self):
+        """Like main.recognition_worker, but keeps going after a match."""
+        rgb = None
+        version = None
+        idle = False
+        buffer = self.grabber.buffer
+        while not self._stop.is_set():
+            frame, _ = buffer.get(timeout=0.2)
+            if frame is None:
+                if buffer.closed:
+                    break
+                continue
+            if self.reloader is not None and self.reloader.current[0] != version:
+                if version is not None:
+                    self.tracker.invalidate()
+                version, self.gallery = self.reloader.current
+            if self.motion is not None:
+                if not self.motion.check(frame):
+                    idle = True
+                    buffer.recycle(frame)
+                    continue
+                if idle:
+                    self.tracker.reset()   # whoever is at the door now is not who was tracked before the lull
+                    idle = False
+                cpu_start = time.thread_time()
+            rgb = reuse_buffer(rgb, frame)
+            cv.cvtColor(frame, cv.COLOR_BGR2RGB, dst=rgb)
+            match = None
+            for result in recognize_tracked(rgb, self.gallery, DIST_THRESH, self.tracker,
+                                            detect_scale=self.scale, detector=self.detector,
+                                            unknowns=self.unknowns):
+                if result.name is not None:
+                    match = result
+                    break
+            if self.motion is not None:
+                self.motion.record(time.thread_time() - cpu_start)
+            if match is None:
+                buffer.recycle(frame)
+                continue
+            try:
+                self.matches.put_nowait((self, frame, match))
+            except queue.Full:
+                buffer.recycle(frame)
+
+    def stop(self):
+        self._stop.set()
+        self.grabber.stop()
+        if self._worker.is_alive():
+            self._worker.join(1.0)
+        self.cap.release()
+
+    def stats(self):
+        stats = self.grabber.buffer.stats()
+        stats["encoded"] = self.tracker.encoded
+        stats["encode_calls"] = self.tracker.encode_calls
+        if self.motion is not None:
+            stats["motion"] = self.motion.stats()
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face recognition for several doors in one process")
+    parser.add_argument('--map', nargs='+', default=[f"{d}={c}" for d, c in DOOR_CAMERAS.items()],
+                        help='DOOR=CAMERA_INDEX pairs, e.g. main=0 back=1')
+    parser.add_argument('--scale', type=float, default=DETECT_SCALE, help='Frame scale for face detection')
+    parser.add_argument('--detector', default=DETECTOR, choices=sorted(DETECTORS), help='Face detector backend')
+    parser.add_argument('--gate', action='store_true', help='Run the detector only around Haar cascade hits')
+    parser.add_argument('--workers', type=int, default=2, help='Detector instances shared by all cameras')
+    parser.add_argument('--motion', nargs='?', const="diff", choices=METHODS,
+                        help='Recognize a camera only while something moves in it (frame differencing, or mog2)')
+    parser.add_argument('--hold', type=float, default=MOTION_HOLD_SECS,
+                        help='Seconds to keep recognizing after the motion stops')
+    parser.add_argument('--no-evidence', action='store_true', help='Do not save snapshots of unlocks')
+    parser.add_argument('--no-unknowns', action='store_true', help='Do not cluster faces that match no one')
+    parser.add_argument('--duration', type=float, default=0, help='Seconds to run (0 = until q is pressed)')
+    args = parser.parse_args()
+    if not 0 < args.scale <= 1:
+        parser.error("--scale must be in (0, 1]")
+    try:
+        mapping = parse_mapping(args.map)
+    except ValueError as e:
+        parser.error(str(e))
+
+    gallery, reloader = load_known_faces(reference_paths(), GALLERY_DIR)
+    print(f"[INFO] References loaded: {gallery.names}")
+
+    def new_detector():
+        detector = make_detector(args.detector)
+        return HaarGate(detector) if args.gate else detector
+    detector = DetectorPool(new_detector, args.workers)
+
+    try:
+        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
+    except Exception:
+        print(f"[WARN] Cannot open {SERIAL_PORT}")
+        ser = None
+
+    evidence = None if args.no_evidence else EvidenceWriter(EVIDENCE_DIR, EVIDENCE_MAX_MB * 2**20).start()
+    unknowns = None if args.no_unknowns else UnknownClusters.load(UNKNOWNS_DIR)
+    matches = queue.Queue(maxsize=len(mapping))
+    stations = []
+    for door, index in mapping.items():
+        cap = open_camera([index])
+        if not cap:
+            print(f"[ERROR] No camera on index {index} for the {door} door.")
+            continue
+        motion = MotionGate(args.hold, method=args.motion) if args.motion else None   # one background per camera
+        stations.append(DoorStation(door, cap, gallery, detector, matches, args.scale, unknowns, reloader, motion))
+    if not stations:
+        print("[ERROR] No camera found. Exiting.")
+        return
+    for station in stations:
+        cv.namedWindow(f"Door: {station.door}", cv.WINDOW_NORMAL)
+        station.start()
+
+    start_time = time.time()
+    last_saved = start_time
+    last_sent = {}
+    print(f"[INFO] Watching {', '.join(f'{s.door} door' for s in stations)}. Press 'q' to quit.")
+    while True:
+        for station in stations:
+            buffer = station.grabber.buffer
+            if buffer.seq != station.last_seq:
+                station.display = reuse_buffer(station.display, buffer.peek())
+                station.last_seq = buffer.copy_latest(station.display)
+                cv.imshow(f"Door: {station.door}", station.display)
+        key = cv.waitKey(1) & 0xFF
+        if key == ord('q'):
+            print("[INFO] 'q' pressed, quitting.")
+            break
+        if args.duration and time.time() - start_time > args.duration:
+            break
+        if any(s.grabber.failed for s in stations):
+            print("[ERROR] Frame grab failed.")
+            break
+        if unknowns is not None and time.time() - last_saved > UNKNOWNS_SAVE_SECS:
+            unknowns.save()
+            last_saved = time.time()
+
+        try:
+            station, frame, result = matches.get_nowait()
+        except queue.Empty:
+            continue
+        door = station.door
+        now = time.time()
+        if now - last_sent.get(door, 0.0) >= DOOR_COOLDOWN:
+            last_sent[door] = now
+            print(f"[INFO] {door} door: match {result.name} ({result.distance:.3f})")
+            if ser:
+                ser.write(DOOR_COMMANDS[door])
+                print(f"[SERIAL] Sent: {DOOR_COMMANDS[door].decode().strip()}")
+            if evidence is not None:
+                evidence.submit(frame, "unlock", result.name, result.distance, door, result.box)
+            (top, right, bottom, left) = result.box
+            cv.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+            cv.putText(frame, result.name, (left, top - 5), cv.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+            cv.imshow(f"Door: {door}", frame)
+        station.grabber.buffer.recycle(frame)
+
+    for station in stations:
+        station.stop()
+    if reloader is not None:
+        reloader.stop()
+    if evidence is not None:
+        evidence.close()
+    if unknowns is not None:
+        unknowns.save()
+    cv.destroyAllWindows()
+    if ser:
+        ser.close()
+
+    elapsed = time.time() - start_time
+    for station in stations:
+        stats = station.stats()
+        print(f"[STATS] {station.door} door: {stats['taken']} frames recognized "
+              f"({stats['taken'] / elapsed:.1f} FPS), {stats['dropped']} dropped, "
+              f"{stats['encoded']} faces encoded")
+        if "motion" in stats:
+            gate = stats["motion"]
+            print(f"[STATS] {station.door} door motion gate: {gate['duty_cycle']:.0%} duty cycle, "
+                  f"{gate['segments']} motion events, ~{gate['cpu_saved_s']:.1f}s CPU saved")
+    cpu, peak = process_usage()
+    peak_text = f"{peak:.0f} MiB" if peak is not None else "n/a"
+    print(f"[STATS] one process for {len(stations)} doors: {cpu:.1f}s CPU "
+          f"({cpu / elapsed * 100:.0f}% of one core), peak memory {peak_text}")
+
+
+if __name__ == '__main__':
+    main()
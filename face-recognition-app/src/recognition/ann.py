@@ -0,0 +1,158 @@
+import numpy as np
+
+from recognition.gallery import Gallery
+
+N_LISTS = 0      # 0 picks about sqrt(size) inverted lists when training
+NPROBE  = 8      # inverted lists scanned per face
+TRAIN_PER_LIST = 32
+ASSIGN_CHUNK = 65536
+OVERLOAD = 2.0   # with N_LISTS = 0, retrain once lists hold this many times the rows sqrt(size) lists would
+
+
+def auto_lists(size):
+    """List count N_LISTS = 0 picks for size rows: about sqrt(size)."""
+    return max(1, int(np.sqrt(size)))
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1)
+    return vectors / np.where(norms > 0, norms, 1.0)[:, None], norms.astype(np.float32)
+
+
+def _nearest_centroid(unit, centroids):
+    """Index of the most similar centroid for every row, in chunks to bound memory."""
+    out = np.empty(len(unit), dtype=np.int64)
+    for first in range(0, len(unit), ASSIGN_CHUNK):
+        out[first:first + ASSIGN_CHUNK] = np.argmax(unit[first:first + ASSIGN_CHUNK] @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour index for very large galleries: an
+    inverted file over spherical k-means centroids, in plain NumPy.
+    A face is compared only with the rows of its nprobe closest lists.
+    Rows keep their norms, so the returned distances are the same
+    Euclidean distances Gallery.match gives for the rows it scans.
+    """
+
+    def __init__(self, centroids, nprobe=NPROBE):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.nprobe = nprobe
+        n_lists = len(self.centroids)
+        dim = self.centroids.shape[1]
+        self.matrices = [np.empty((0, dim), dtype=np.float32) for _ in range(n_lists)]
+        self.norms = [np.empty(0, dtype=np.float32) for _ in range(n_lists)]
+        self.ids = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+        self.names = []
+
+    @classmethod
+    def train(cls, encodings, n_lists=N_LISTS, nprobe=NPROBE, iters=10, seed=0):
+        """k-means centroids from a sample of encodings; call add() to fill the lists."""
+        unit, _ = _unit(encodings)
+        if len(unit) == 0:
+            return cls(np.empty((0, unit.shape[1]), dtype=np.float32), nprobe)
+        if n_lists <= 0:
+            n_lists = auto_lists(len(unit))
+        n_lists = min(n_lists, len(unit))
+        rng = np.random.default_rng(seed)
+        sample = unit[rng.choice(len(unit), min(len(unit), n_lists * TRAIN_PER_LIST), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iters):
+            assign = _nearest_centroid(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=n_lists)
+            empty = counts == 0
+            # re-seed empty lists with random samples
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids, _ = _unit(sums)
+        return cls(centroids, nprobe)
+
+    def __len__(self):
+        return len(self.names)
+
+    def needs_retrain(self, n_lists=N_LISTS, size=None):
+        """
+        True when the list count picked at training (n_lists = 0, auto) is
+        far below what size rows (default: the rows held) call for: add()
+        never adds lists, so a gallery that started small ends up with a
+        few huge lists and scans most of itself per face.
+        """
+        if n_lists > 0:
+            return False
+        size = len(self) if size is None else size
+        return auto_lists(size) > OVERLOAD * len(self.centroids)
+
+    def add(self, encodings, names):
+        """Insert encodings incrementally into their nearest lists; see needs_retrain()."""
+        if len(encodings) == 0:
+            return
+        unit, norms = _unit(encodings)
+        assign = _nearest_centroid(unit, self.centroids)
+        ids = np.arange(len(self.names), len(self.names) + len(unit))
+        self.names.extend(names)
+        for c in np.unique(assign):
+            rows = assign == c
+            self.matrices[c] = np.concatenate([self.matrices[c], unit[rows]])
+            self.norms[c] = np.concatenate([self.norms[c], norms[rows]])
+            self.ids[c] = np.concatenate([self.ids[c], ids[rows]])
+
+    def match(self, encodings, k=1):
+        """Top-k per face, as (names, distances) like Gallery.match; missing entries are (None, inf)."""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(len(encodings), -1)
+        n_faces = len(queries)
+        if n_faces == 0 or len(self) == 0:
+            return [[] for _ in range(n_faces)], np.empty((n_faces, 0), dtype=np.float32)
+        unit, _ = _unit(queries)
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(unit @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        names, dists = [], []
+        for face, lists in enumerate(probes):
+            ids = np.concatenate([self.ids[c] for c in lists])
+            if len(ids) == 0:
+                names.append([])
+                dists.append(np.empty(0, dtype=np.float32))
+                continue
+            # exact distances, but only to the rows of the probed lists
+            scanned = Gallery.from_normalized(np.concatenate([self.matrices[c] for c in lists]),
+                                              np.concatenate([self.norms[c] for c in lists]), ())
+            row_dists = scanned.distances(queries[face])[0]
+            top = np.argpartition(row_dists, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+            top = top[np.argsort(row_dists[top])]
+            names.append([self.names[i] for i in ids[top]])
+            dists.append(row_dists[top])
+        # a face whose probed lists hold fewer than k rows is padded (None, inf),
+        # so it does not cut the results of the other faces in the frame
+        width = min(k, len(self))
+        padded = np.full((n_faces, width), np.inf, dtype=np.float32)
+        for face, d in enumerate(dists):
+            padded[face, :len(d)] = d
+            names[face] = names[face] + [None] * (width - len(d))
+        return names, padded
+
+    def nbytes(self):
+        return (self.centroids.nbytes + sum(m.nbytes for m in self.matrices)
+                + sum(n.nbytes for n in self.norms) + sum(i.nbytes for i in self.ids))
+
+    def arrays(self):
+        """(matrix, norms, ids, offsets): the lists back to back, list c at offsets[c]:offsets[c + 1]."""
+        offsets = np.concatenate(([0], np.cumsum([len(m) for m in self.matrices]))).astype(np.int64)
+        if not self.matrices:
+            dim = self.centroids.shape[1]
+            return np.empty((0, dim), np.float32), np.empty(0, np.float32), np.empty(0, np.int64), offsets
+        return (np.concatenate(self.matrices), np.concatenate(self.norms),
+                np.concatenate(self.ids), offsets)
+
+    @classmethod
+    def from_arrays(cls, centroids, matrix, norms, ids, offsets, names, nprobe=NPROBE):
+        """Inverse of arrays(); the lists are views, so memory-mapped arrays stay mapped."""
+        index = cls(centroids, nprobe)
+        for c in range(len(index.centroids)):
+            start, end = offsets[c], offsets[c + 1]
+            index.matrices[c] = matrix[start:end]
+            index.norms[c] = norms[start:end]
+            index.ids[c] = ids[start:end]
+        index.names = list(names)
+        return index
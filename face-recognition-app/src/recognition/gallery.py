@@ -0,0 +1,155 @@
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+CHUNK_ROWS = 16384   # quantized rows widened to float32 at a time
+
+
+def quantize_rows(unit, dtype):
+    """
+    (matrix, scales) for L2-normalized rows stored as dtype. int8 rows
+    get one scale each (their largest component maps to 127); scales is
+    None for the float types.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"unknown gallery dtype {dtype!r}, expected one of {DTYPES}")
+    if dtype != "int8":
+        return np.ascontiguousarray(unit, dtype=dtype), None
+    peak = np.abs(unit).max(axis=1) if len(unit) else np.empty(0, dtype=np.float32)
+    scales = (np.where(peak > 0, peak, 1.0) / 127.0).astype(np.float32)
+    return np.rint(unit / scales[:, None]).astype(np.int8), scales
+
+
+class Gallery:
+    """
+    Known faces held as one contiguous matrix.
+    Rows are L2-normalized so a whole frame is matched with a single
+    matrix product; the row norms are kept so the returned distances are
+    the same Euclidean distances face_recognition.face_distance gives.
+    Rows are float32 by default; float16 and int8 rows take 2x and ~4x
+    less memory and are widened to float32 one chunk at a time.
+    """
+
+    def __init__(self, encodings, names, dtype="float32"):
+        if len(encodings) != len(names):
+            raise ValueError("encodings and names must have the same length")
+        if len(names):
+            matrix = np.asarray(encodings, dtype=np.float32).reshape(len(names), -1)
+        else:
+            matrix = np.empty((0, 128), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+        safe = np.where(norms > 0, norms, 1.0).astype(np.float32)
+        self.matrix, self.scales = quantize_rows(matrix / safe[:, None], dtype)
+        self.norms = norms.astype(np.float32)
+        self.names = list(names)
+
+    @classmethod
+    def from_normalized(cls, matrix, norms, names, scales=None):
+        """Wrap an already normalized matrix (e.g. memory-mapped) without copying it."""
+        gallery = cls.__new__(cls)
+        gallery.matrix = matrix
+        gallery.norms = norms
+        gallery.scales = scales
+        gallery.names = list(names)
+        return gallery
+
+    @classmethod
+    def from_known_faces(cls, known):
+        """Build from the (encodings, names) pair returned by load_known_faces."""
+        encodings, names = known
+        return cls(encodings, names)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    @property
+    def dtype(self):
+        return self.matrix.dtype.name
+
+    @property
+    def nbytes(self):
+        scales = self.scales.nbytes if self.scales is not None else 0
+        return self.matrix.nbytes + self.norms.nbytes + scales
+
+    def quantize(self, dtype):
+        """Copy of this gallery with its rows stored as dtype, converted chunk by chunk."""
+        if dtype == self.dtype:
+            return self
+        parts = [quantize_rows(self._unit_rows(first, first + CHUNK_ROWS), dtype)
+                 for first in range(0, len(self), CHUNK_ROWS)]
+        if not parts:
+            parts = [quantize_rows(np.empty((0, self.dim), dtype=np.float32), dtype)]
+        matrix = np.concatenate([m for m, _ in parts])
+        scales = np.concatenate([s for _, s in parts]) if dtype == "int8" else None
+        return Gallery.from_normalized(matrix, np.array(self.norms), self.names, scales)
+
+    def _unit_rows(self, start, end, rows=None):
+        """float32 unit rows [start:end] (of rows, when given), dequantized."""
+        if rows is None:
+            block = self.matrix[start:end].astype(np.float32)
+            scales = None if self.scales is None else self.scales[start:end]
+        else:
+            block = self.matrix[rows[start:end]].astype(np.float32)
+            scales = None if self.scales is None else self.scales[rows[start:end]]
+        if scales is not None:
+            block *= scales[:, None]
+        return block
+
+    def encodings(self, rows=None):
+        """Original (un-normalized) encodings, optionally only some rows."""
+        if rows is None:
+            return self._unit_rows(0, len(self)) * self.norms[:, None]
+        rows = np.asarray(rows, dtype=np.int64)
+        return self._unit_rows(0, len(rows), rows) * self.norms[rows][:, None]
+
+    def distances(self, encodings, rows=None):
+        """
+        Euclidean distances, shape (faces, identities), in one matrix product.
+        rows restricts the comparison to those gallery rows.
+        """
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        q_norms = np.linalg.norm(queries, axis=1)
+        q_unit = queries / np.where(q_norms > 0, q_norms, 1.0)[:, None]
+        norms = self.norms if rows is None else self.norms[rows]
+        if self.matrix.dtype == np.float32:
+            matrix = self.matrix if rows is None else self.matrix[rows]
+            cos = q_unit @ matrix.T
+        else:
+            # widen one chunk at a time instead of the whole quantized matrix
+            if rows is not None:
+                rows = np.asarray(rows, dtype=np.int64)
+            cos = np.empty((len(queries), len(norms)), dtype=np.float32)
+            for first in range(0, len(norms), CHUNK_ROWS):
+                block = self._unit_rows(first, first + CHUNK_ROWS, rows)
+                cos[:, first:first + CHUNK_ROWS] = q_unit @ block.T
+        # |q - g|^2 = |q|^2 + |g|^2 - 2|q||g|cos
+        sq = (q_norms[:, None] ** 2 + norms[None, :] ** 2
+              - 2.0 * q_norms[:, None] * norms[None, :] * cos)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def match(self, encodings, k=1):
+        """
+        Match every face of a frame at once.
+        Returns (names, distances): names is a list with one list of the k
+        closest identities per face, distances a (faces, k) array, both
+        sorted from closest to furthest.
+        """
+        n_faces = len(encodings)
+        if n_faces == 0 or len(self) == 0:
+            return [[] for _ in range(n_faces)], np.empty((n_faces, 0), dtype=np.float32)
+        k = min(k, len(self))
+        dists = self.distances(encodings)
+        if k < len(self):
+            top = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(len(self)), (n_faces, 1))
+        top_dists = np.take_along_axis(dists, top, axis=1)
+        order = np.argsort(top_dists, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_dists = np.take_along_axis(top_dists, order, axis=1)
+        names = [[self.names[i] for i in row] for row in top]
+        return names, top_dists
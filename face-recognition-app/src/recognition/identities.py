@@ -0,0 +1,141 @@
+import re
+import numpy as np
+
+from recognition.gallery import Gallery
+
+MAX_EXEMPLARS  = None    # samples kept per identity besides its centroid; None keeps every non-duplicate
+DUPLICATE_DIST = 0.15    # samples closer than this to a kept one add nothing
+SHORTLIST      = 3       # identities whose exemplars are checked per face
+
+
+def person_name(sample_name):
+    """Identity a reference sample belongs to: 'Nour1' and 'Nour' are both 'Nour'."""
+    name = re.sub(r"[\s_\-]*\d+$", "", sample_name)
+    return name or sample_name
+
+
+def spread_samples(samples, count):
+    """
+    Pick up to count samples (all of them when count is None) that cover
+    the identity well: the one closest to the centroid first, then
+    repeatedly the one furthest from those chosen.
+    """
+    if count is None or len(samples) <= count:
+        return samples
+    centroid = samples.mean(axis=0)
+    chosen = [int(np.argmin(np.linalg.norm(samples - centroid, axis=1)))]
+    nearest = np.linalg.norm(samples - samples[chosen[0]], axis=1)
+    while len(chosen) < count:
+        pick = int(np.argmax(nearest))
+        chosen.append(pick)
+        nearest = np.minimum(nearest, np.linalg.norm(samples - samples[pick], axis=1))
+    return samples[chosen]
+
+
+class IdentityGallery:
+    """
+    One entry per person instead of one per reference photo: a centroid
+    of the person's samples plus its exemplars. A face is compared with
+    every centroid, then only with the exemplars of the closest
+    shortlist identities; the identity distance is its nearest exemplar.
+    Same match() interface as Gallery.
+
+    By default every sample that is not a near-duplicate is an exemplar,
+    so the shortlist is the only approximation. Capping max_exemplars
+    saves memory but costs recall: with 3 exemplars, 10k synthetic
+    references and 4 (8) photos per person, 5% (15%) of the enrolled
+    faces the full scan accepts were rejected; none went to the wrong person.
+    """
+
+    def __init__(self, centroids, exemplars, offsets, shortlist=SHORTLIST):
+        self.centroids = centroids   # Gallery, row i is identity i
+        self.exemplars = exemplars   # Gallery, identity i owns rows offsets[i]:offsets[i + 1]
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.shortlist = shortlist
+
+    @classmethod
+    def build(cls, encodings, sample_names, max_exemplars=MAX_EXEMPLARS, duplicate_dist=DUPLICATE_DIST,
+              grouping=person_name):
+        """
+        Group samples by grouping(name) (by the names themselves when
+        grouping is None, e.g. for store rows that are already labelled by
+        person), drop near-duplicate samples and keep a centroid plus up to
+        max_exemplars exemplars per identity (all of them when None).
+        Returns (gallery, number of near-duplicates rejected).
+        """
+        encodings = np.asarray(encodings, dtype=np.float32)
+        groups = {}
+        for row, name in enumerate(sample_names):
+            groups.setdefault(name if grouping is None else grouping(name), []).append(row)
+
+        # rows are written into preallocated arrays: np.asarray over a list of
+        # 100k rows is one long call that would hold the GIL (see GalleryReloader)
+        dim = encodings.shape[1] if encodings.ndim == 2 else 128
+        centroids = np.empty((len(groups), dim), dtype=np.float32)
+        capacity = len(encodings) if max_exemplars is None else min(len(encodings), len(groups) * max_exemplars)
+        exemplars = np.empty((capacity, dim), dtype=np.float32)
+        names, offsets = [], [0]
+        rejected = 0
+        for person, rows in groups.items():
+            kept = []
+            for sample in encodings[rows]:
+                if kept and np.min(np.linalg.norm(np.asarray(kept) - sample, axis=1)) < duplicate_dist:
+                    rejected += 1
+                    continue
+                kept.append(sample)
+            kept = np.asarray(kept)
+            centroids[len(names)] = kept.mean(axis=0)
+            names.append(person)
+            chosen = spread_samples(kept, max_exemplars)
+            exemplars[offsets[-1]:offsets[-1] + len(chosen)] = chosen
+            offsets.append(offsets[-1] + len(chosen))
+        exemplars = exemplars[:offsets[-1]]
+
+        exemplar_names = [n for i, n in enumerate(names) for _ in range(offsets[i + 1] - offsets[i])]
+        gallery = cls(Gallery(centroids, names), Gallery(exemplars, exemplar_names), offsets)
+        return gallery, rejected
+
+    def __len__(self):
+        return len(self.centroids)
+
+    @property
+    def nbytes(self):
+        return self.centroids.nbytes + self.exemplars.nbytes + self.offsets.nbytes
+
+    def quantize(self, dtype):
+        """Copy with the centroid and exemplar rows stored as dtype (see Gallery.quantize)."""
+        return IdentityGallery(self.centroids.quantize(dtype), self.exemplars.quantize(dtype),
+                               self.offsets, self.shortlist)
+
+    @property
+    def names(self):
+        return self.centroids.names
+
+    def match(self, encodings, k=1):
+        """Top-k identities per face, as (names, distances) like Gallery.match."""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(len(encodings), -1)
+        n_faces = len(queries)
+        if n_faces == 0 or len(self) == 0:
+            return [[] for _ in range(n_faces)], np.empty((n_faces, 0), dtype=np.float32)
+        shortlist = min(max(self.shortlist, k), len(self))
+        k = min(k, shortlist)
+        centroid_dists = self.centroids.distances(queries)
+        if shortlist < len(self):
+            candidates = np.argpartition(centroid_dists, shortlist - 1, axis=1)[:, :shortlist]
+        else:
+            candidates = np.tile(np.arange(len(self)), (n_faces, 1))
+
+        starts, ends = self.offsets[:-1], self.offsets[1:]
+        names = []
+        dists = np.empty((n_faces, k), dtype=np.float32)
+        for face, ids in enumerate(candidates):
+            counts = ends[ids] - starts[ids]
+            rows = np.concatenate([np.arange(starts[i], ends[i]) for i in ids])
+            exemplar_dists = self.exemplars.distances(queries[face], rows)[0]
+            # nearest exemplar of each candidate identity
+            segment = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            best = np.minimum.reduceat(exemplar_dists, segment)
+            order = np.argsort(best)[:k]
+            names.append([self.names[ids[j]] for j in order])
+            dists[face] = best[order]
+        return names, dists
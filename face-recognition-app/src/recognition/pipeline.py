@@ -0,0 +1,138 @@
+import threading
+from collections import namedtuple
+
+import cv2 as cv
+import face_recognition
+
+from utils.timing import stage
+
+# box is (top, right, bottom, left) like face_recognition; name is None
+# when the closest identity is not within the threshold.
+FaceResult = namedtuple("FaceResult", ["box", "name", "distance"])
+
+# face_recognition keeps one dlib face detector, landmark predictor and
+# face encoder as module globals, and dlib does not make them safe to call
+# from several threads at once. Every call into them holds this lock;
+# detector backends with their own dlib objects (HogDetector) do not need it.
+DLIB_LOCK = threading.Lock()
+
+
+def box_iou(a, b):
+    """Intersection-over-union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+def dedupe_boxes(locations, iou_thresh=0.5):
+    """Drop duplicate or overlapping boxes, keeping the larger one."""
+    by_area = sorted(locations, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]), reverse=True)
+    kept = []
+    for box in by_area:
+        if all(box_iou(box, other) < iou_thresh for other in kept):
+            kept.append(box)
+    return kept
+
+
+def scale_boxes(locations, scale, shape):
+    """Map boxes found on a frame resized by scale back onto a frame of the given shape."""
+    height, width = shape[:2]
+    mapped = []
+    for (top, right, bottom, left) in locations:
+        mapped.append((
+            max(0, int(round(top / scale))),
+            min(width, int(round(right / scale))),
+            min(height, int(round(bottom / scale))),
+            max(0, int(round(left / scale))),
+        ))
+    return mapped
+
+
+def detect_faces_scaled(rgb, scale=1.0, detector=None, timer=None):
+    """
+    Run the detector (face_locations when None) on a copy of the frame
+    shrunk by scale and return the boxes in full-resolution coordinates.
+    """
+    locate = _locked_face_locations if detector is None else detector.detect
+    if scale == 1.0:
+        with stage(timer, "detect"):
+            return locate(rgb)
+    with stage(timer, "resize"):
+        small = cv.resize(rgb, (0, 0), fx=scale, fy=scale, interpolation=cv.INTER_AREA)
+    with stage(timer, "detect"):
+        locations = locate(small)
+    return scale_boxes(locations, scale, rgb.shape)
+
+
+def recognize_frame(rgb, gallery, threshold, locations=None, detect_scale=1.0, detector=None, timer=None):
+    """
+    Detect (unless locations are given), encode every face with a single
+    face_encodings call and match them all against the gallery.
+    Detection runs at detect_scale with the given detector backend;
+    encodings always use the full-resolution frame.
+    Returns a list of FaceResult, one per distinct face.
+    timer (a utils.timing.StageTimer) gets the detect/encode/match times.
+    """
+    if locations is None:
+        locations = detect_faces_scaled(rgb, detect_scale, detector, timer)
+    locations = dedupe_boxes(locations)
+    if not locations:
+        return []
+    with stage(timer, "encode"):
+        with DLIB_LOCK:
+            encodings = face_recognition.face_encodings(rgb, locations)
+    with stage(timer, "match"):
+        names, dists = gallery.match(encodings, k=1)
+    return [FaceResult(tuple(box), *_identity(best_names, best_dists, threshold))
+            for box, best_names, best_dists in zip(locations, names, dists)]
+
+
+def recognize_tracked(rgb, gallery, threshold, tracker, detect_scale=1.0, detector=None, timer=None,
+                      detect=True, model="small", unknowns=None):
+    """
+    Like recognize_frame, but boxes are followed by a FaceTracker and only
+    tracks that are new, due for re-verification or have moved a lot are
+    encoded; the others reuse their cached identity. With detect=False
+    the frame is not looked at and the tracks seen last time are returned.
+    model is the face_encodings landmark model. Fresh encodings that match
+    no one go to unknowns (a recognition.unknowns.UnknownClusters), if given.
+    """
+    if not detect:
+        return [FaceResult(t.box, t.name, t.distance) for t in tracker.tracks
+                if t.missed == 0 and t.verified_at is not None]
+    locations = dedupe_boxes(detect_faces_scaled(rgb, detect_scale, detector, timer))
+    visible, stale = tracker.update(locations)
+    if stale:
+        with stage(timer, "encode"):
+            with DLIB_LOCK:
+                encodings = face_recognition.face_encodings(rgb, [t.box for t in stale], model=model)
+        tracker.encode_calls += 1
+        tracker.encoded += len(stale)
+        with stage(timer, "match"):
+            names, dists = gallery.match(encodings, k=1)
+        for track, best_names, best_dists in zip(stale, names, dists):
+            tracker.record(track, *_identity(best_names, best_dists, threshold))
+        if unknowns is not None:
+            unmatched = [i for i, track in enumerate(stale) if track.name is None]
+            if unmatched:
+                with stage(timer, "cluster"):
+                    unknowns.add([encodings[i] for i in unmatched], rgb, [stale[i].box for i in unmatched])
+    return [FaceResult(t.box, t.name, t.distance) for t in visible]
+
+
+def _locked_face_locations(rgb):
+    with DLIB_LOCK:
+        return face_recognition.face_locations(rgb)
+
+
+def _identity(best_names, best_dists, threshold):
+    """(name or None, distance) for one face's top-1 match."""
+    if len(best_dists) == 0:
+        return None, float("inf")
+    distance = float(best_dists[0])
+    return (best_names[0] if distance < threshold else None), distance
@@ -0,0 +1,133 @@
+from collections import namedtuple
+
+# One rung of the quality ladder. interval is how often detection runs
+# (every interval-th frame; tracked faces carry over in between) and
+# model is the face_encodings landmark model.
+QualityLevel = namedtuple("QualityLevel", ["scale", "upsample", "interval", "model"])
+
+HOG_WINDOW = 80          # px; dlib's HOG detector finds no face smaller than this in the image it scans
+MIN_RESOLUTION = 1.0     # scale * 2 ** upsample never drops below this, so no rung misses faces over HOG_WINDOW px
+LARGE_MODEL_COST = 1.2   # rough frame cost of the large landmark model relative to the small one
+
+# Cheapest first. The lower rungs save time through the detection
+# interval at the floor resolution (scale * 2 ** upsample == 1, faces of
+# ~80 px and up); the upper ones spend spare time on resolution, upsample
+# 2 at full scale finding faces down to ~20 px. Detection cost grows with
+# the square of the resolution and shrinks with the interval, so each rung
+# here costs about 1.2x to 2x the one below it; see estimated_cost().
+LADDER = [
+    QualityLevel(0.5, 1, 3, "small"),
+    QualityLevel(0.5, 1, 2, "small"),
+    QualityLevel(0.5, 1, 1, "small"),
+    QualityLevel(1.0, 1, 2, "small"),
+    QualityLevel(1.0, 1, 1, "small"),
+    QualityLevel(1.0, 1, 1, "large"),
+    QualityLevel(1.0, 2, 2, "large"),
+    QualityLevel(1.0, 2, 1, "large"),
+]
+
+
+def check_ladder(ladder):
+    """Raise ValueError when a rung detects below MIN_RESOLUTION."""
+    for i, level in enumerate(ladder):
+        if level.scale * 2 ** level.upsample < MIN_RESOLUTION:
+            raise ValueError(f"quality level {i} ({describe(level)}) is below the detection "
+                             f"resolution floor scale * 2^upsample >= {MIN_RESOLUTION}")
+
+
+def min_face(level):
+    """Smallest face in px of the camera frame that HOG detection finds at this rung."""
+    return int(round(HOG_WINDOW / (level.scale * 2 ** level.upsample)))
+
+
+def estimated_cost(level):
+    """Rough per-frame cost of a rung in units of the floor resolution detecting every frame."""
+    cost = (level.scale * 2 ** level.upsample) ** 2 / level.interval
+    return cost * (LARGE_MODEL_COST if level.model == "large" else 1.0)
+
+
+def describe(level):
+    every = "every frame" if level.interval == 1 else f"every {level.interval} frames"
+    return (f"scale {level.scale}, upsample {level.upsample} (min face ~{min_face(level)} px), "
+            f"detect {every}, {level.model} landmarks")
+
+
+class QualityController:
+    """
+    Holds the recognition loop to a per-frame time budget by moving along
+    LADDER. Frame times are averaged over window frames (frames that skip
+    detection included, so the mean is the amortized cost). Above the
+    budget it steps down one rung. It steps up only when the next rung is
+    predicted to fit within headroom * budget; the prediction uses the
+    cost ratio between the two rungs measured the last time it stepped up
+    (estimated_cost() until measured), so a rung that did not fit is not
+    retried until the load has dropped enough.
+    """
+
+    def __init__(self, budget_ms=100.0, detector=None, ladder=LADDER, level=None,
+                 window=10, headroom=0.9):
+        check_ladder(ladder)
+        self.budget = budget_ms / 1000.0
+        self.detector = detector
+        self.ladder = ladder
+        self.level = len(ladder) // 2 if level is None else level
+        self.window = window
+        self.headroom = headroom
+        self.changes = 0
+        self._times = []
+        self._frame = 0
+        self._ratio = {}          # rung -> measured cost of rung + 1 / cost of rung
+        self._raised_from = None  # (mean, rung) of the window before the last step up
+        self._apply()
+
+    @property
+    def settings(self):
+        return self.ladder[self.level]
+
+    def should_detect(self):
+        """True when this frame runs detection; call once per frame."""
+        run = self._frame % self.settings.interval == 0
+        self._frame += 1
+        return run
+
+    def record(self, seconds):
+        """Frame time of one processed frame; may change the level."""
+        self._times.append(seconds)
+        if len(self._times) < self.window:
+            return
+        mean = sum(self._times) / len(self._times)
+        self._times = []
+        if self._raised_from is not None:
+            below_mean, below = self._raised_from
+            self._ratio[below] = mean / max(below_mean, 1e-6)
+            self._raised_from = None
+        if mean > self.budget and self.level > 0:
+            self._step(-1, f"mean {mean * 1000:.0f} ms > {self.budget * 1000:.0f} ms budget")
+        elif self.level < len(self.ladder) - 1:
+            predicted = mean * self._ratio.get(self.level, self._estimated_ratio())
+            if predicted < self.budget * self.headroom:
+                self._raised_from = (mean, self.level)
+                self._step(+1, f"mean {mean * 1000:.0f} ms, next level predicted {predicted * 1000:.0f} ms")
+
+    def _estimated_ratio(self):
+        return estimated_cost(self.ladder[self.level + 1]) / estimated_cost(self.settings)
+
+    def _step(self, direction, reason):
+        old = self.level
+        self.level += direction
+        self.changes += 1
+        self._frame = 0
+        self._apply()
+        print(f"[QUALITY] level {old} -> {self.level}: {describe(self.settings)} ({reason})")
+
+    def _apply(self):
+        """Push the upsample setting into the detector (or the detector a gate wraps), if it has one."""
+        detector = self.detector
+        while detector is not None:
+            if hasattr(detector, "upsample"):
+                detector.upsample = self.settings.upsample
+                return
+            detector = getattr(detector, "detector", None)
+
+
+check_ladder(LADDER)
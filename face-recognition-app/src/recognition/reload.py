@@ -0,0 +1,79 @@
+import time
+import threading
+
+import numpy as np
+
+RELOAD_INTERVAL = 1.0   # seconds between checks of the store
+
+
+class GalleryReloader:
+    """
+    Watches a GalleryStore and swaps in a new gallery when another process
+    (enrollment, unknown_visitors.py --enroll) has rewritten it. The new
+    version is loaded on a background thread with load(), and its pages
+    are touched once so the first frame after the swap does not fault
+    them in. Then (version, gallery) is replaced in one assignment.
+    Recognition threads read current between frames and keep using their
+    own reference until then, so a match in flight finishes on the old
+    gallery, which is freed when the last frame using it is done.
+    A rewrite is picked up once the store has been unchanged for one
+    interval, so a half-finished sync is never loaded. version is the
+    store version gallery came from (default: the current one), so a
+    rewrite that lands before the reloader is created is not missed.
+    """
+
+    def __init__(self, store, load, gallery, interval=RELOAD_INTERVAL, version=None):
+        self.store = store
+        self.load = load
+        self.interval = interval
+        self.current = (0, gallery)
+        self._seen = store.version() if version is None else version
+        self._pending = self._seen
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="GalleryReloader", daemon=True)
+        # counters
+        self.reloads = 0
+        self.failed = 0
+        self.last_load_s = 0.0
+
+    @property
+    def gallery(self):
+        return self.current[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(self.interval + 1.0)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        """Check the store once; load and swap when it has changed and settled. Returns True on a swap."""
+        version = self.store.version()
+        if version == self._seen:
+            return False
+        if version != self._pending:
+            self._pending = version   # still being written, or just finished: look again next time
+            return False
+        start = time.perf_counter()
+        try:
+            gallery = self.load()
+            gallery.match(np.zeros((1, 128), dtype=np.float32), k=1)   # fault the new pages in here
+        except (OSError, ValueError) as e:
+            self.failed += 1
+            print(f"[WARN] Gallery reload failed, keeping the current one: {e}")
+            return False
+        if self.store.version() != version:
+            return False   # rewritten while loading; the next poll loads the newer one
+        self.last_load_s = time.perf_counter() - start
+        self._seen = version
+        self.current = (self.current[0] + 1, gallery)
+        self.reloads += 1
+        print(f"[CACHE] Gallery reloaded in {self.last_load_s:.2f}s: {len(gallery)} entries")
+        return True
@@ -0,0 +1,516 @@
+import os
+import glob
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+import cv2 as cv
+import face_recognition
+
+from recognition.gallery import Gallery
+from recognition.identities import IdentityGallery, person_name, MAX_EXEMPLARS, DUPLICATE_DIST
+from recognition.ann import IVFIndex, N_LISTS, NPROBE
+from recognition.pipeline import DLIB_LOCK
+from utils.image_processing import resize_keep_aspect, iter_labelled_paths
+
+# Encoding parameters are part of every cache key, so changing them
+# re-encodes the affected images instead of reusing stale encodings.
+ENCODING_PARAMS = {"model": "small", "num_jitters": 1, "max_side": 1600}
+
+MATRIX_FILE = "matrix.npy"    # L2-normalized float32 rows
+NORMS_FILE  = "norms.npy"     # original row norms
+INDEX_FILE  = "index.json"    # names, content hashes and file stats, row-aligned
+NAMES_FILE  = "names.npy"     # row-aligned names and content hashes again, as arrays that load
+HASHES_FILE = "hashes.npy"    # without parsing the index (it holds the GIL for ~0.2s at 100k rows)
+CURRENT_FILE = "current.json" # which version of the four arrays above is current; written last
+IDENTITY_DIR = "identities"   # per-person centroids and exemplars built from the rows above
+ANN_DIR      = "ann"          # inverted-file index over the rows above
+SOURCES_FILE = "sources.json" # directories and manifests enrolled by generate_reference_encoding.py
+
+
+def content_hash(path, params=ENCODING_PARAMS):
+    """sha1 of the encoding parameters followed by the image bytes."""
+    h = hashlib.sha1(json.dumps(params, sort_keys=True).encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def encode_image(path, params=ENCODING_PARAMS):
+    """First face encoding of the image at path, or None. Oversized photos are downscaled first."""
+    img = cv.imread(path)
+    if img is None:
+        print(f"[WARN] cv.imread failed: {path}")
+        return None
+    img = resize_keep_aspect(img, (params["max_side"], params["max_side"]))
+    rgb = cv.cvtColor(img, cv.COLOR_BGR2RGB)
+    with DLIB_LOCK:   # a background sync may encode while the recognition worker does
+        encs = face_recognition.face_encodings(rgb, num_jitters=params["num_jitters"], model=params["model"])
+    if not encs:
+        print(f"[WARN] No face in: {path}")
+        return None
+    return encs[0]
+
+
+def _save_atomic(path, write):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+# Array files are never overwritten: a running recognizer has them
+# memory-mapped, and on Windows a mapped file can be neither replaced nor
+# deleted. Every write goes to a new versioned file or folder, and old
+# versions are deleted afterwards; one still mapped somewhere is skipped
+# and goes on a later call.
+
+LEGACY_FILES = {"generation": 0, "matrix": MATRIX_FILE, "norms": NORMS_FILE,
+                "names": NAMES_FILE, "hashes": HASHES_FILE}
+
+
+def _versioned(name, generation):
+    """matrix.npy -> matrix-12.npy"""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}-{generation}{ext}"
+
+
+def _try_remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass   # gone already, or still mapped by a process (Windows)
+
+
+def _versions(directory, prefix=""):
+    """Finished version folders in directory whose name starts with prefix, newest first."""
+    found = glob.glob(os.path.join(directory, glob.escape(prefix) + "*", INDEX_FILE))
+    found.sort(key=lambda path: os.stat(path).st_mtime_ns, reverse=True)
+    return [os.path.dirname(path) for path in found]
+
+
+def _new_version(directory, source):
+    """Empty folder for a new version built from source; finished once its index.json is written."""
+    path = os.path.join(directory, f"{source}-{os.getpid()}-{time.time_ns():x}")
+    os.makedirs(path)
+    return path
+
+
+def _drop_versions(directory, keep):
+    """Delete every version folder (and loose files of the old layout) in directory except keep."""
+    for path in glob.glob(os.path.join(directory, "*")):
+        if os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        if os.path.isdir(path):
+            _try_remove(os.path.join(path, INDEX_FILE))   # unfinished from here on, even if files stay
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            _try_remove(path)
+
+
+def _load_version(load, attempts=3):
+    """
+    load() a version; retried when a concurrent sync() deleted its files
+    between reading which version is current and opening them.
+    """
+    for attempt in range(attempts):
+        try:
+            return load()
+        except FileNotFoundError:
+            if attempt == attempts - 1:
+                raise
+
+
+class GalleryStore:
+    """
+    Content-addressed encoding cache on disk.
+
+    Each reference image is keyed by content_hash(); sync() only encodes
+    images whose key is new and drops rows for images that are gone. The
+    matrix is stored as .npy files that load with mmap_mode, so opening
+    the gallery does not depend on how many references it holds.
+    A sync writes a new version of the arrays instead of replacing them,
+    so it can run while a recognizer has the current ones mapped.
+    Directories and manifests enrolled with add_source() are part of every
+    sync, so the recognizer never evicts what enrollment added. Every row
+    is named after the person it shows, which is what identities group by.
+    """
+
+    def __init__(self, directory, params=ENCODING_PARAMS):
+        self.directory = directory
+        self.params = params
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def exists(self):
+        return os.path.exists(self._path(INDEX_FILE))
+
+    def version(self):
+        """Generation of the current arrays, which sync() writes last; None before the first sync."""
+        if not os.path.exists(self._path(CURRENT_FILE)):
+            try:
+                st = os.stat(self._path(INDEX_FILE))   # store written before versioning
+            except OSError:
+                return None
+            return st.st_mtime_ns, st.st_size
+        try:
+            return self._current()["generation"]
+        except (OSError, ValueError):
+            return None
+
+    def _current(self):
+        """File names of the current matrix, norms, names and hashes, plus their generation."""
+        try:
+            with open(self._path(CURRENT_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return dict(LEGACY_FILES)
+
+    def sources(self):
+        """Directories and manifests added with add_source(), as absolute paths."""
+        try:
+            with open(self._path(SOURCES_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except OSError:
+            return []
+
+    def add_source(self, source):
+        """Remember a directory or manifest, so every later sync() includes its images."""
+        sources = self.sources()
+        source = os.path.abspath(source)
+        if source not in sources:
+            os.makedirs(self.directory, exist_ok=True)
+            data = json.dumps(sources + [source], indent=1).encode("utf-8")
+            _save_atomic(self._path(SOURCES_FILE), lambda f: f.write(data))
+
+    def read_index(self):
+        if not self.exists():
+            return {"params": self.params, "entries": [], "skipped": {}}
+        with open(self._path(INDEX_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_arrays(self, mmap_mode="r"):
+        """(matrix, norms, index) with the arrays memory-mapped."""
+        return _load_version(lambda: self._load_arrays(mmap_mode))
+
+    def _load_arrays(self, mmap_mode):
+        index = self.read_index()
+        if not index["entries"]:
+            return np.empty((0, 128), dtype=np.float32), np.empty(0, dtype=np.float32), index
+        files = index.get("files", LEGACY_FILES)
+        matrix = np.load(self._path(files["matrix"]), mmap_mode=mmap_mode)
+        norms = np.load(self._path(files["norms"]), mmap_mode=mmap_mode)
+        if len(matrix) != len(index["entries"]) or len(norms) != len(matrix):
+            raise ValueError(f"store in {self.directory!r} does not match its index "
+                             f"({len(matrix)} rows, {len(index['entries'])} entries)")
+        return matrix, norms, index
+
+    def load_samples(self):
+        """
+        (matrix, norms, names, hashes) of every sample, arrays memory-mapped.
+        Read from the .npy files next to the index, falling back to the
+        index for stores written before they existed.
+        """
+        return _load_version(self._load_samples)
+
+    def _load_samples(self):
+        files = self._current()
+        if not os.path.exists(self._path(files["names"])):
+            matrix, norms, index = self.load_arrays()
+            return (matrix, norms, np.array([e["name"] for e in index["entries"]], dtype=str),
+                    np.array([e["hash"] for e in index["entries"]], dtype=str))
+        names = np.load(self._path(files["names"]), mmap_mode="r")
+        hashes = np.load(self._path(files["hashes"]), mmap_mode="r")
+        if not len(names):
+            return np.empty((0, 128), dtype=np.float32), np.empty(0, dtype=np.float32), names, hashes
+        matrix = np.load(self._path(files["matrix"]), mmap_mode="r")
+        norms = np.load(self._path(files["norms"]), mmap_mode="r")
+        if not len(matrix) == len(norms) == len(names) == len(hashes):
+            raise ValueError(f"store in {self.directory!r} does not match its index "
+                             f"({len(matrix)} rows, {len(names)} names)")
+        return matrix, norms, names, hashes
+
+    @staticmethod
+    def samples_digest(names, hashes, params=None):
+        """
+        sha1 of the sample names and hashes (and the build params, if any):
+        the key the derived identities/ and ann/ are saved under.
+        """
+        h = hashlib.sha1(np.ascontiguousarray(hashes).tobytes())
+        h.update(np.ascontiguousarray(names).tobytes())
+        if params is not None:
+            h.update(json.dumps(params, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def load_gallery(self, dtype="float32"):
+        """
+        Gallery of every sample. float32 rows stay memory-mapped; float16
+        and int8 rows are quantized from the map into memory.
+        """
+        matrix, norms, names, _ = self.load_samples()
+        return Gallery.from_normalized(matrix, norms, names.tolist()).quantize(dtype)
+
+    def load_identity_gallery(self, dtype="float32"):
+        """
+        IdentityGallery for the current samples, memory-mapped from
+        identities/<digest>-*/ (quantized to dtype like load_gallery). It is
+        built (and saved in a new folder) only when no folder for the
+        current samples and identity settings exists yet.
+        Returns (gallery, samples, rejected).
+        """
+        matrix, norms, names, hashes = self.load_samples()
+        source = self.samples_digest(names, hashes, {"max_exemplars": MAX_EXEMPLARS,
+                                                     "duplicate_dist": DUPLICATE_DIST})
+        ident_dir = self._path(IDENTITY_DIR)
+        for version in _versions(ident_dir, source):
+            try:
+                with open(os.path.join(version, INDEX_FILE), "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                load = lambda name: np.load(os.path.join(version, name), mmap_mode="r")
+                exemplar_names = [n for i, n in enumerate(saved["names"])
+                                  for _ in range(saved["offsets"][i + 1] - saved["offsets"][i])]
+                gallery = IdentityGallery(
+                    Gallery.from_normalized(load("centroids.npy"), load("centroid_norms.npy"), saved["names"]),
+                    Gallery.from_normalized(load("exemplars.npy"), load("exemplar_norms.npy"), exemplar_names),
+                    saved["offsets"])
+            except FileNotFoundError:
+                continue   # being dropped by another process
+            return gallery.quantize(dtype), len(names), saved["rejected"]
+
+        samples = Gallery.from_normalized(matrix, norms, names.tolist())
+        gallery, rejected = IdentityGallery.build(samples.encodings(), samples.names, grouping=None)
+        version = _new_version(ident_dir, source)
+        for name, array in (("centroids.npy", gallery.centroids.matrix),
+                            ("centroid_norms.npy", gallery.centroids.norms),
+                            ("exemplars.npy", gallery.exemplars.matrix),
+                            ("exemplar_norms.npy", gallery.exemplars.norms)):
+            np.save(os.path.join(version, name), array)
+        data = json.dumps({"source": source, "names": gallery.names,
+                           "offsets": gallery.offsets.tolist(), "rejected": rejected}).encode("utf-8")
+        _save_atomic(os.path.join(version, INDEX_FILE), lambda f: f.write(data))
+        _drop_versions(ident_dir, version)
+        return gallery.quantize(dtype), len(samples), rejected
+
+    def load_ann_index(self, n_lists=N_LISTS, nprobe=NPROBE):
+        """
+        IVFIndex over the current samples, memory-mapped from ann/<digest>-*/.
+        Samples added since the newest saved index are inserted into its
+        lists (saved as a new folder); it is retrained only when samples
+        were removed, n_lists changed, or the gallery has outgrown the
+        auto-sized list count (IVFIndex.needs_retrain).
+        Returns (index, inserted, retrained).
+        """
+        matrix, norms, names, hashes = self.load_samples()
+        source = self.samples_digest(names, hashes)
+        ann_dir = self._path(ANN_DIR)
+        index = None
+        for version in _versions(ann_dir):
+            load = lambda name, v=version: np.load(os.path.join(v, name), mmap_mode="r")
+            try:
+                with open(os.path.join(version, INDEX_FILE), "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                if saved["n_lists"] != n_lists:
+                    continue
+                if saved["source"] == source:
+                    index = IVFIndex.from_arrays(load("centroids.npy"), load("matrix.npy"), load("norms.npy"),
+                                                 load("ids.npy"), load("offsets.npy"), load("names.npy").tolist(),
+                                                 nprobe)
+                    if not index.needs_retrain(n_lists):
+                        return index, 0, False
+                ordered = load("samples.npy").tolist()
+                keys = set(f"{h}:{n}" for h, n in zip(hashes.tolist(), names.tolist()))
+                if set(ordered) <= keys:
+                    index = IVFIndex.from_arrays(load("centroids.npy"), load("matrix.npy"), load("norms.npy"),
+                                                 load("ids.npy"), load("offsets.npy"), load("names.npy").tolist(),
+                                                 nprobe)
+                    indexed = set(ordered)
+            except FileNotFoundError:
+                continue   # being dropped by another process
+            break   # only the newest index with these n_lists is worth extending
+
+        keys = [f"{h}:{n}" for h, n in zip(hashes.tolist(), names.tolist())]
+        samples = Gallery.from_normalized(matrix, norms, names.tolist())
+        if index is not None and index.needs_retrain(n_lists, len(keys)):
+            print(f"[CACHE] ANN index has {len(index.centroids)} lists for {len(keys)} samples; retraining")
+            index = None
+        if index is None:
+            index = IVFIndex.train(samples.encodings(), n_lists, nprobe)
+            indexed, ordered = set(), []
+        new_rows = [row for row, key in enumerate(keys) if key not in indexed]
+        index.add(samples.encodings(new_rows), [samples.names[row] for row in new_rows])
+        ordered = ordered + [keys[row] for row in new_rows]
+
+        # copy out of the old maps, so the old version can be dropped
+        matrix, norms, ids, offsets = index.arrays()
+        index = IVFIndex.from_arrays(np.array(index.centroids), matrix, norms, ids, offsets, index.names, nprobe)
+        version = _new_version(ann_dir, source)
+        for name, array in (("centroids.npy", index.centroids), ("matrix.npy", matrix),
+                            ("norms.npy", norms), ("ids.npy", ids), ("offsets.npy", offsets),
+                            ("samples.npy", np.array(ordered, dtype=str)),
+                            ("names.npy", np.array(index.names, dtype=str))):
+            np.save(os.path.join(version, name), array)
+        data = json.dumps({"n_lists": n_lists, "source": source}).encode("utf-8")
+        _save_atomic(os.path.join(version, INDEX_FILE), lambda f: f.write(data))
+        _drop_versions(ann_dir, version)
+        return index, len(new_rows), not indexed
+
+    def sync(self, paths, precomputed=None, evict=True, labels=None):
+        """
+        Bring the store in line with paths plus the images of every added
+        source: reuse rows whose content hash is unchanged, encode new or
+        changed images, evict the rest. With evict=False (enrollment) the
+        other rows are kept. Nothing is evicted either while an added
+        source is missing, e.g. on an unplugged drive.
+        precomputed maps content hash -> encoding (None for no face) for
+        images already encoded elsewhere, e.g. by the enrollment pool.
+        labels maps path -> person; images of sources are labelled by
+        iter_labelled_paths(), and any other path by its file name with
+        trailing digits dropped ('Nour1.jpg' is 'Nour').
+        Returns (encoded, reused, evicted) counts.
+        """
+        precomputed = precomputed or {}
+        # absolute, so a file listed relative to the enrollment script and found under a source is one row
+        paths = [os.path.abspath(path) for path in paths]
+        labels = {os.path.abspath(path): label for path, label in (labels or {}).items()}
+        for source in self.sources():
+            if not os.path.exists(source):
+                print(f"[WARN] Enrolled source missing, keeping its encodings: {source}")
+                evict = False
+                continue
+            for path, label in iter_labelled_paths(source):
+                path = os.path.abspath(path)
+                paths.append(path)
+                labels.setdefault(path, label)
+        try:
+            matrix, norms, index = self.load_arrays()
+        except ValueError as e:
+            # e.g. a sync that stopped between the arrays and the index: start over
+            print(f"[WARN] {e}; re-encoding everything")
+            matrix, norms = np.empty((0, 128), dtype=np.float32), np.empty(0, dtype=np.float32)
+            index = {"params": self.params, "entries": [], "skipped": {}}
+        old_rows = {e["hash"]: row for row, e in enumerate(index["entries"])}
+        old_stats = {e["path"]: e for e in index["entries"]}
+        skipped = index.get("skipped", {})
+        old_stats.update(skipped)
+
+        entries, rows, new_skipped = [], [], {}
+        new_encs = []
+        encoded = reused = 0
+        seen = set()
+        for path in paths:
+            if path in seen:
+                continue
+            seen.add(path)
+            if not os.path.exists(path):
+                print(f"[WARN] Missing: {path}")
+                continue
+            st = os.stat(path)
+            prev = old_stats.get(path)
+            if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+                key = prev["hash"]
+            else:
+                key = content_hash(path, self.params)
+            stat = {"path": path, "hash": key, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            if key in old_rows:
+                rows.append(("old", old_rows[key]))
+                reused += 1
+            elif prev and prev.get("hash") == key and path in skipped:
+                new_skipped[path] = stat   # known to have no usable face
+                continue
+            else:
+                if key in precomputed:
+                    enc = precomputed[key]
+                else:
+                    enc = encode_image(path, self.params)
+                if enc is None:
+                    new_skipped[path] = stat
+                    continue
+                rows.append(("new", len(new_encs)))
+                new_encs.append(enc)
+                encoded += 1
+                if key not in precomputed:
+                    print(f"[OK] Encoded '{path}'")
+            stat["name"] = labels.get(path) or person_name(os.path.splitext(os.path.basename(path))[0])
+            entries.append(stat)
+        if not evict:
+            for row, entry in enumerate(index["entries"]):
+                if entry["path"] not in seen:
+                    rows.append(("old", row))
+                    entries.append(entry)
+            for path, stat in skipped.items():
+                if path not in seen:
+                    new_skipped[path] = stat
+
+        evicted = len(index["entries"]) - len({row for source, row in rows if source == "old"})
+        if rows != [("old", i) for i in range(len(index["entries"]))] or not self.exists():
+            out_matrix, out_norms = self._assemble(matrix, norms, rows, new_encs)
+            del matrix, norms
+            self._commit(entries, new_skipped, out_matrix, out_norms)
+        elif (entries != index["entries"] or new_skipped != skipped
+              or not os.path.exists(self._path(CURRENT_FILE))):
+            self._commit(entries, new_skipped)
+        return encoded, reused, evicted
+
+    def _assemble(self, matrix, norms, rows, new_encs):
+        fresh = Gallery(new_encs, [""] * len(new_encs)) if new_encs else None
+        dim = fresh.dim if fresh is not None else matrix.shape[1]
+        out_matrix = np.empty((len(rows), dim), dtype=np.float32)
+        out_norms = np.empty(len(rows), dtype=np.float32)
+        old_pos = [i for i, (source, _) in enumerate(rows) if source == "old"]
+        new_pos = [i for i, (source, _) in enumerate(rows) if source == "new"]
+        if old_pos:
+            old_idx = [rows[i][1] for i in old_pos]
+            out_matrix[old_pos] = matrix[old_idx]
+            out_norms[old_pos] = norms[old_idx]
+        if new_pos:
+            new_idx = [rows[i][1] for i in new_pos]
+            out_matrix[new_pos] = fresh.matrix[new_idx]
+            out_norms[new_pos] = fresh.norms[new_idx]
+        return out_matrix, out_norms
+
+    def _commit(self, entries, skipped, matrix=None, norms=None):
+        """
+        Write a new version: matrix and norms when given (else the current
+        ones carry over), names and hashes, the index, then CURRENT_FILE,
+        which marks a finished sync. Older versions are dropped after.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        files = self._current()
+        generation = max(files["generation"], self._newest_generation()) + 1
+        files["generation"] = generation
+        arrays = [(NAMES_FILE, "names", np.array([e["name"] for e in entries], dtype=str)),
+                  (HASHES_FILE, "hashes", np.array([e["hash"] for e in entries], dtype=str))]
+        if matrix is not None:
+            arrays += [(MATRIX_FILE, "matrix", matrix), (NORMS_FILE, "norms", norms)]
+        for name, key, array in arrays:
+            files[key] = _versioned(name, generation)
+            np.save(self._path(files[key]), array)
+        index = {"params": self.params, "entries": entries, "skipped": skipped, "files": files}
+        data = json.dumps(index, indent=1).encode("utf-8")
+        _save_atomic(self._path(INDEX_FILE), lambda f: f.write(data))
+        data = json.dumps(files).encode("utf-8")
+        _save_atomic(self._path(CURRENT_FILE), lambda f: f.write(data))
+        self._drop_arrays(files)
+
+    def _newest_generation(self):
+        """Highest generation with files on disk, so a new version never reuses a file name."""
+        newest = 0
+        for name in (NAMES_FILE, MATRIX_FILE):
+            stem, ext = os.path.splitext(name)
+            for path in glob.glob(self._path(f"{stem}-*{ext}")):
+                number = os.path.basename(path)[len(stem) + 1:-len(ext)]
+                if number.isdigit():
+                    newest = max(newest, int(number))
+        return newest
+
+    def _drop_arrays(self, files):
+        """Delete the array files of older versions (and of the unversioned layout)."""
+        keep = set(files[key] for key in ("matrix", "norms", "names", "hashes"))
+        for name in (MATRIX_FILE, NORMS_FILE, NAMES_FILE, HASHES_FILE):
+            stem, ext = os.path.splitext(name)
+            for path in [self._path(name)] + glob.glob(self._path(f"{stem}-*{ext}")):
+                if os.path.basename(path) not in keep:
+                    _try_remove(path)
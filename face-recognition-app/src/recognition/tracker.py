@@ -0,0 +1,117 @@
+import time
+
+from recognition.pipeline import box_iou
+
+
+class Track:
+    """A face followed across frames, with the identity from its last encoding."""
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.name = None
+        self.distance = float("inf")
+        self.verified_at = None    # frame number of the last encoding
+        self.verified_time = None  # clock time of the last encoding
+        self.verified_box = None   # box at the last encoding
+        self.missed = 0
+        self.last_seen = now
+
+
+class FaceTracker:
+    """
+    IoU tracker with a per-track identity cache. A track is encoded when
+    it first appears, then only every reverify_every frames (or
+    reverify_secs seconds, whichever comes first) or when its box has
+    moved so much that it overlaps its last encoded box by less than
+    change_iou. A track is dropped after max_missed frames without its
+    face, or max_age seconds, so a slow or gated loop never hands an old
+    identity to a new face.
+    """
+
+    def __init__(self, iou_thresh=0.3, reverify_every=15, change_iou=0.5, max_missed=5,
+                 reverify_secs=1.0, max_age=1.0, clock=time.monotonic):
+        self.iou_thresh = iou_thresh
+        self.reverify_every = reverify_every
+        self.change_iou = change_iou
+        self.max_missed = max_missed
+        self.reverify_secs = reverify_secs
+        self.max_age = max_age
+        self.clock = clock
+        self.tracks = []
+        self.frame_no = 0
+        self._next_id = 1
+        # counters
+        self.encode_calls = 0
+        self.encoded = 0
+
+    def update(self, boxes):
+        """
+        Associate this frame's boxes with the live tracks.
+        Returns (visible, stale): the tracks seen in this frame and the
+        subset of them that needs a fresh encoding.
+        """
+        self.frame_no += 1
+        now = self.clock()
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age]
+        pairs = sorted(((box_iou(t.box, b), ti, bi)
+                        for ti, t in enumerate(self.tracks) for bi, b in enumerate(boxes)),
+                       reverse=True)
+        used_tracks, used_boxes = set(), set()
+        visible = []
+        for iou, ti, bi in pairs:
+            if iou < self.iou_thresh:
+                break
+            if ti in used_tracks or bi in used_boxes:
+                continue
+            used_tracks.add(ti)
+            used_boxes.add(bi)
+            track = self.tracks[ti]
+            track.box = tuple(boxes[bi])
+            track.missed = 0
+            track.last_seen = now
+            visible.append(track)
+
+        survivors = []
+        for ti, track in enumerate(self.tracks):
+            if ti not in used_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            survivors.append(track)
+        for bi, box in enumerate(boxes):
+            if bi not in used_boxes:
+                track = Track(self._next_id, tuple(box), now)
+                self._next_id += 1
+                survivors.append(track)
+                visible.append(track)
+        self.tracks = survivors
+
+        stale = [t for t in visible if self._needs_encoding(t, now)]
+        return visible, stale
+
+    def _needs_encoding(self, track, now):
+        if track.verified_at is None:
+            return True
+        if self.frame_no - track.verified_at >= self.reverify_every:
+            return True
+        if now - track.verified_time >= self.reverify_secs:
+            return True
+        return box_iou(track.box, track.verified_box) < self.change_iou
+
+    def invalidate(self):
+        """Forget every cached identity, e.g. after the gallery was reloaded; tracks are re-encoded when next seen."""
+        for track in self.tracks:
+            track.verified_at = None
+
+    def reset(self):
+        """Drop every track, e.g. when the motion gate opens again after the doorway was empty."""
+        self.tracks = []
+
+    def record(self, track, name, distance):
+        """Store the identity from a fresh encoding of the track."""
+        track.name = name
+        track.distance = distance
+        track.verified_at = self.frame_no
+        track.verified_time = self.clock()
+        track.verified_box = track.box
@@ -0,0 +1,260 @@
+import os
+import time
+import threading
+from collections import namedtuple
+
+import numpy as np
+import cv2 as cv
+
+CLUSTER_RADIUS = 0.5     # a sighting this close to a centre joins its cluster
+MAX_CLUSTERS   = 500     # least recurring cluster is evicted beyond this
+MAX_WEIGHT     = 50      # centres keep adapting after this many sightings
+VISIT_GAP      = 600.0   # seconds without a sighting before the next one counts as a new visit
+CROP_MARGIN    = 0.25    # context kept around the face box, as a fraction of its size
+CROP_MAX_SIDE  = 200
+CLUSTERS_FILE  = "clusters.npz"
+CROPS_DIR      = "crops"
+FIELDS = ("centres", "ids", "sightings", "visits", "first_seen", "last_seen", "best_dist")   # saved per cluster
+
+# One recurring unknown face. visits counts sightings at least VISIT_GAP apart.
+UnknownVisitor = namedtuple("UnknownVisitor", ["id", "visits", "sightings", "first_seen", "last_seen"])
+
+
+def face_crop(rgb, box, margin=CROP_MARGIN, max_side=CROP_MAX_SIDE):
+    """BGR crop of box with some margin, downscaled so its longest side is at most max_side."""
+    top, right, bottom, left = box
+    pad_y, pad_x = int((bottom - top) * margin), int((right - left) * margin)
+    height, width = rgb.shape[:2]
+    crop = rgb[max(0, top - pad_y):min(height, bottom + pad_y), max(0, left - pad_x):min(width, right + pad_x)]
+    if crop.size == 0:
+        return None
+    side = max(crop.shape[:2])
+    if side > max_side:
+        crop = cv.resize(crop, (0, 0), fx=max_side / side, fy=max_side / side, interpolation=cv.INTER_AREA)
+    return cv.cvtColor(crop, cv.COLOR_RGB2BGR)
+
+
+class UnknownClusters:
+    """
+    Online leader clustering of faces that matched no one. Each sighting
+    joins the closest centre within radius (the centre moves towards it)
+    or starts a new cluster; all centres are held in one preallocated
+    matrix, so an update is one matrix-vector product over at most
+    max_clusters rows however many sightings came before. When full, the
+    cluster with the fewest visits (oldest first) is evicted. Every
+    cluster keeps the crop of its sighting closest to the centre.
+    State lives in directory (clusters.npz plus crops/ID.jpg) and is
+    written by save(); crops wait in memory only until the next save.
+    save() merges with what is on disk, so clusters another process
+    removed (unknown_visitors.py --enroll/--forget) stay removed and
+    clusters it saved are kept.
+    """
+
+    def __init__(self, directory, radius=CLUSTER_RADIUS, max_clusters=MAX_CLUSTERS, dim=128,
+                 visit_gap=VISIT_GAP):
+        self.directory = directory
+        self.radius = radius
+        self.max_clusters = max_clusters
+        self.visit_gap = visit_gap
+        self.centres = np.zeros((max_clusters, dim), dtype=np.float32)
+        self.sq_norms = np.zeros(max_clusters, dtype=np.float32)
+        self.ids = np.zeros(max_clusters, dtype=np.int64)
+        self.sightings = np.zeros(max_clusters, dtype=np.int64)
+        self.visits = np.zeros(max_clusters, dtype=np.int64)
+        self.first_seen = np.zeros(max_clusters, dtype=np.float64)
+        self.last_seen = np.zeros(max_clusters, dtype=np.float64)
+        self.best_dist = np.zeros(max_clusters, dtype=np.float32)   # of the kept crop
+        self.size = 0
+        self.next_id = 1
+        self._crops = {}        # id -> crop not yet written
+        self._removed = set()   # ids whose crop file is to be deleted
+        self._on_disk = set()   # ids in the clusters file as of the last load or save
+        self._lock = threading.Lock()
+        # counters
+        self.added = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def load(cls, directory, **kwargs):
+        """Clusters saved in directory, or an empty set when there are none."""
+        saved = _read(os.path.join(directory, CLUSTERS_FILE))
+        if saved is None:
+            return cls(directory, **kwargs)
+        clusters = cls(directory, dim=saved["centres"].shape[1], **kwargs)
+        size = min(len(saved["ids"]), clusters.max_clusters)
+        for field in FIELDS:
+            getattr(clusters, field)[:size] = saved[field][:size]
+        clusters.next_id = int(saved["next_id"])
+        clusters.size = size
+        clusters.sq_norms[:size] = np.einsum("ij,ij->i", clusters.centres[:size], clusters.centres[:size])
+        clusters._on_disk = set(clusters.ids[:size].tolist())
+        return clusters
+
+    def add(self, encodings, rgb=None, boxes=None, now=None):
+        """
+        Record unmatched faces of one frame. The faces of a frame are
+        compared with the centres in a single matrix product; they are
+        different people, so none joins a cluster another one just started.
+        rgb and boxes, when given, supply the crops. Returns the cluster ids.
+        """
+        queries = np.asarray(encodings, dtype=np.float32).reshape(len(encodings), -1)
+        if len(queries) == 0:
+            return []
+        now = time.time() if now is None else now
+        with self._lock:
+            n = self.size
+            # |q - c|^2 = |q|^2 + |c|^2 - 2 q.c
+            sq = (np.einsum("ij,ij->i", queries, queries)[:, None] + self.sq_norms[None, :n]
+                  - 2.0 * (queries @ self.centres[:n].T))
+            np.maximum(sq, 0.0, out=sq)
+            dists = np.sqrt(sq)
+            out = []
+            for i, query in enumerate(queries):
+                row = int(np.argmin(dists[i])) if n else -1
+                if row >= 0 and dists[i, row] <= self.radius:
+                    dist = float(dists[i, row])
+                    self._update(row, query, now)
+                else:
+                    row, dist = self._new_cluster(query, now), 0.0
+                    if row < n:
+                        dists[i + 1:, row] = np.inf   # evicted: its old centre is gone
+                if rgb is not None and boxes is not None and dist <= self.best_dist[row]:
+                    crop = face_crop(rgb, boxes[i])
+                    if crop is not None:
+                        self._crops[int(self.ids[row])] = crop
+                        self.best_dist[row] = dist
+                out.append(int(self.ids[row]))
+            self.added += len(queries)
+        return out
+
+    def _update(self, row, query, now):
+        self.sightings[row] += 1
+        if now - self.last_seen[row] >= self.visit_gap:
+            self.visits[row] += 1
+        self.last_seen[row] = now
+        centre = self.centres[row]
+        centre += (query - centre) / min(self.sightings[row], MAX_WEIGHT)
+        self.sq_norms[row] = centre @ centre
+
+    def _new_cluster(self, query, now):
+        if self.size < self.max_clusters:
+            row = self.size
+            self.size += 1
+        else:
+            # fewest visits first, then least recently seen
+            row = int(np.lexsort((self.last_seen, self.visits))[0])
+            self._drop(row)
+            self.evicted += 1
+        self.centres[row] = query
+        self.sq_norms[row] = query @ query
+        self.ids[row] = self.next_id
+        self.next_id += 1
+        self.sightings[row] = 1
+        self.visits[row] = 1
+        self.first_seen[row] = self.last_seen[row] = now
+        self.best_dist[row] = np.inf
+        return row
+
+    def _drop(self, row):
+        cluster_id = int(self.ids[row])
+        self._crops.pop(cluster_id, None)
+        self._removed.add(cluster_id)
+
+    def remove(self, cluster_id):
+        """Forget a cluster, e.g. once it has been enrolled. Returns False when there is none."""
+        with self._lock:
+            rows = np.flatnonzero(self.ids[:self.size] == cluster_id)
+            if not len(rows):
+                return False
+            self._remove_row(int(rows[0]))
+            return True
+
+    def _remove_row(self, row):
+        last = self.size - 1
+        self._drop(row)
+        for field in FIELDS + ("sq_norms",):
+            array = getattr(self, field)
+            array[row] = array[last]
+        self.size = last
+
+    def centre(self, cluster_id):
+        rows = np.flatnonzero(self.ids[:self.size] == cluster_id)
+        return self.centres[rows[0]].copy() if len(rows) else None
+
+    def top(self, count=10, min_visits=1):
+        """The most recurring unknowns: most visits first, then most sightings."""
+        with self._lock:
+            n = self.size
+            order = np.lexsort((-self.sightings[:n], -self.visits[:n]))
+            return [UnknownVisitor(int(self.ids[r]), int(self.visits[r]), int(self.sightings[r]),
+                                   float(self.first_seen[r]), float(self.last_seen[r]))
+                    for r in order[:count] if self.visits[r] >= min_visits]
+
+    def crop(self, cluster_id):
+        """Representative BGR crop of a cluster, or None."""
+        crop = self._crops.get(cluster_id)
+        if crop is not None:
+            return crop
+        return cv.imread(self.crop_path(cluster_id))
+
+    def crop_path(self, cluster_id):
+        return os.path.join(self.directory, CROPS_DIR, f"{cluster_id}.jpg")
+
+    def _merge(self, saved):
+        """
+        Fold in what other processes wrote since our last load or save:
+        clusters that were on disk then and are gone now were removed
+        there, and clusters we never saw were added there.
+        """
+        disk = {cluster_id: i for i, cluster_id in enumerate(saved["ids"].tolist())}
+        for row in reversed(range(self.size)):
+            cluster_id = int(self.ids[row])
+            if cluster_id in self._on_disk and cluster_id not in disk:
+                self._remove_row(row)
+        ours = set(self.ids[:self.size].tolist())
+        for cluster_id, i in disk.items():
+            if cluster_id in self._on_disk or cluster_id in ours or self.size >= self.max_clusters:
+                continue
+            row = self.size
+            self.size += 1
+            for field in FIELDS:
+                getattr(self, field)[row] = saved[field][i]
+            self.sq_norms[row] = self.centres[row] @ self.centres[row]
+        self.next_id = max(self.next_id, int(saved["next_id"]))
+
+    def save(self):
+        """Merge with the clusters file (see _merge), then write it and the crops that changed since the last save."""
+        path = os.path.join(self.directory, CLUSTERS_FILE)
+        saved = _read(path)
+        with self._lock:
+            if saved is not None:
+                self._merge(saved)
+            n = self.size
+            arrays = {field: getattr(self, field)[:n].copy() for field in FIELDS}
+            crops, self._crops = self._crops, {}
+            removed, self._removed = self._removed, set()
+            next_id = self.next_id
+            self._on_disk = set(arrays["ids"].tolist())
+        os.makedirs(os.path.join(self.directory, CROPS_DIR), exist_ok=True)
+        for cluster_id, crop in crops.items():
+            cv.imwrite(self.crop_path(cluster_id), crop)
+        for cluster_id in removed - set(crops):
+            try:
+                os.remove(self.crop_path(cluster_id))
+            except OSError:
+                pass
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, next_id=np.int64(next_id), **arrays)
+        os.replace(tmp, path)
+
+
+def _read(path):
+    """Arrays and next_id of a clusters file, or None when there is none."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {key: data[key] for key in FIELDS + ("next_id",)}
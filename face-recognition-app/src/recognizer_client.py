@@ -0,0 +1,45 @@
+import json
+import asyncio
+
+SERVICE_HOST    = "127.0.0.1"
+SERVICE_PORT    = 50555
+CONNECT_TIMEOUT = 2.0     # seconds to reach the recognizer service
+
+
+class RecognizerClient:
+    """
+    Asyncio client for recognizer_service.py. Every call opens a short
+    connection and exchanges one JSON line each way.
+    """
+
+    def __init__(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        self.host = host
+        self.port = port
+
+    async def _request(self, payload, timeout):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), CONNECT_TIMEOUT)
+        try:
+            writer.write((json.dumps(payload) + "\n").encode())
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), timeout)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        if not line:
+            raise ConnectionError("Recognizer service closed the connection")
+        return json.loads(line)
+
+    async def ping(self):
+        """True when the service is up and warm."""
+        reply = await self._request({"cmd": "ping"}, CONNECT_TIMEOUT)
+        return bool(reply.get("ok"))
+
+    async def recognize(self, door="main", timeout=30):
+        """
+        Ask the service to look for a known face for up to timeout seconds.
+        Returns the reply dict: ok, door, name, distance, elapsed on a match;
+        ok=False with a reason ("timeout", "camera", ...) otherwise.
+        """
+        payload = {"cmd": "recognize", "door": door, "timeout": timeout}
+        return await self._request(payload, timeout + CONNECT_TIMEOUT)
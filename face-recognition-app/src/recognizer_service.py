@@ -0,0 +1,171 @@
+"""
+Long-lived face recognition service.
+
+Loads the model, gallery and camera once and answers "recognize for
+door=X, timeout=N" requests over a local socket (one JSON line per
+request and reply), so a door press does not pay the start-up cost of
+main.py. The GUI talks to it through recognizer_client.RecognizerClient
+and sends the door command itself.
+
+    python recognizer_service.py [--port 50555] [--scale 0.5]
+"""
+import json
+import time
+import argparse
+import threading
+import socketserver
+import cv2 as cv
+
+from main import (load_known_faces, open_camera, reference_paths, GALLERY_DIR,
+                  DIST_THRESH, DETECT_SCALE, DETECTOR, CAMERA_INDICES, TIMEOUT_SECS)
+from recognition.pipeline import recognize_frame, recognize_tracked
+from recognition.tracker import FaceTracker
+from camera.capture import FrameGrabber
+from camera.buffers import reuse_buffer
+from face_detection.backends import make_detector, DETECTORS
+from face_detection.gate import HaarGate
+from recognizer_client import SERVICE_HOST, SERVICE_PORT
+
+DOORS = ("main", "back")
+
+
+class RecognizerService:
+    """Keeps the camera streaming and recognizes on demand, one request at a time."""
+
+    def __init__(self, gallery, cap, scale=DETECT_SCALE, detector=None, reloader=None):
+        self._gallery = gallery
+        self.reloader = reloader   # GalleryReloader, when new gallery versions are picked up
+        self.scale = scale
+        self.detector = detector
+        self.grabber = FrameGrabber(cap).start()
+        self._lock = threading.Lock()
+        self._rgb = None   # reused RGB conversion buffer
+
+    @property
+    def gallery(self):
+        return self._gallery if self.reloader is None else self.reloader.gallery
+
+    def warm_up(self, timeout=5.0):
+        """Run one recognition pass so the first real request is not the slow one."""
+        frame, _ = self.grabber.buffer.get(timeout=timeout)
+        if frame is None:
+            return False
+        recognize_frame(cv.cvtColor(frame, cv.COLOR_BGR2RGB), self.gallery, DIST_THRESH,
+                        detect_scale=self.scale, detector=self.detector)
+        self.grabber.buffer.recycle(frame)
+        return True
+
+    def recognize(self, door, timeout):
+        with self._lock:
+            start = time.monotonic()
+            deadline = start + timeout
+            tracker = FaceTracker()
+            gallery = self.gallery
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                frame, _ = self.grabber.buffer.get(timeout=min(remaining, 0.5))
+                if frame is None:
+                    if self.grabber.failed:
+                        return {"ok": False, "door": door, "reason": "camera"}
+                    continue
+                self._rgb = reuse_buffer(self._rgb, frame)
+                cv.cvtColor(frame, cv.COLOR_BGR2RGB, dst=self._rgb)
+                self.grabber.buffer.recycle(frame)
+                if self.gallery is not gallery:   # reloaded: swap between frames and re-verify
+                    gallery = self.gallery
+                    tracker.invalidate()
+                for result in recognize_tracked(self._rgb, gallery, DIST_THRESH, tracker,
+                                                detect_scale=self.scale, detector=self.detector):
+                    if result.name is not None:
+                        elapsed = time.monotonic() - start
+                        print(f"[INFO] Match found: {result.name} ({result.distance:.3f}) "
+                              f"for {door} door in {elapsed:.2f}s")
+                        return {"ok": True, "door": door, "name": result.name,
+                                "distance": result.distance, "elapsed": elapsed}
+            print(f"[INFO] No match within {timeout}s for {door} door.")
+            return {"ok": False, "door": door, "reason": "timeout",
+                    "elapsed": time.monotonic() - start}
+
+    def handle(self, request):
+        cmd = request.get("cmd")
+        if cmd == "ping":
+            return {"ok": True, "identities": len(self.gallery)}
+        if cmd == "recognize":
+            door = request.get("door", "main")
+            if door not in DOORS:
+                return {"ok": False, "reason": f"unknown door {door!r}"}
+            try:
+                timeout = float(request.get("timeout", TIMEOUT_SECS))
+            except (TypeError, ValueError):
+                return {"ok": False, "reason": "bad timeout"}
+            return self.recognize(door, timeout)
+        return {"ok": False, "reason": f"unknown command {cmd!r}"}
+
+    def close(self):
+        if self.reloader is not None:
+            self.reloader.stop()
+        self.grabber.stop()
+        self.grabber.cap.release()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                reply = {"ok": False, "reason": "bad request"}
+            else:
+                reply = self.server.service.handle(request)
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+            self.wfile.flush()
+
+
+class RecognizerServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, service, host=SERVICE_HOST, port=SERVICE_PORT):
+        super().__init__((host, port), _RequestHandler)
+        self.service = service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face recognition service")
+    parser.add_argument('--host', default=SERVICE_HOST, help='Address to listen on')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help='Port to listen on')
+    parser.add_argument('--scale', type=float, default=DETECT_SCALE, help='Frame scale for face detection')
+    parser.add_argument('--detector', default=DETECTOR, choices=sorted(DETECTORS), help='Face detector backend')
+    parser.add_argument('--gate', action='store_true', help='Run the detector only around Haar cascade hits')
+    args = parser.parse_args()
+
+    gallery, reloader = load_known_faces(reference_paths(), GALLERY_DIR)
+    print(f"[INFO] References loaded: {gallery.names}")
+
+    cap = open_camera(CAMERA_INDICES)
+    if not cap:
+        print("[ERROR] No camera found. Exiting.")
+        return
+
+    detector = make_detector(args.detector)
+    if args.gate:
+        detector = HaarGate(detector)
+    service = RecognizerService(gallery, cap, scale=args.scale, detector=detector,
+                                reloader=reloader)
+    if not service.warm_up():
+        print("[WARN] No frame during warm-up.")
+    server = RecognizerServer(service, args.host, args.port)
+    print(f"[INFO] Recognizer service ready on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[INFO] Shutting down.")
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Recurring unknown visitors.
+
+main.py and multi_door.py cluster every face that matches no one into
+UNKNOWNS_DIR. This lists the visitors seen most often, exports their
+crops for a look, and enrolls one under a name in a single step: its
+crop is saved to ENROLLED_DIR and its cluster centre goes straight into
+the gallery store, so the next start recognizes them.
+
+    python unknown_visitors.py [--top 10] [--export top_unknowns/]
+    python unknown_visitors.py --enroll 12 Ali
+    python unknown_visitors.py --forget 12
+"""
+import os
+import time
+import argparse
+import cv2 as cv
+
+from main import GALLERY_DIR, UNKNOWNS_DIR, ENROLLED_DIR
+from recognition.store import GalleryStore, content_hash
+from recognition.unknowns import UnknownClusters
+
+
+def _when(seconds):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(seconds))
+
+
+def valid_name(name):
+    """A person name usable as a file name in ENROLLED_DIR: no path separator or drive colon, not '.' or '..'."""
+    return bool(name.strip()) and name not in (".", "..") and not any(c in name for c in "/\\:")
+
+
+def enroll(clusters, cluster_id, name):
+    """Save the cluster's crop as a reference photo of name and add its centre to the store."""
+    if not valid_name(name):
+        print(f"[ERROR] Invalid name {name!r}: it must not be empty, '.', '..' or contain a path separator.")
+        return False
+    centre, crop = clusters.centre(cluster_id), clusters.crop(cluster_id)
+    if centre is None or crop is None:
+        print(f"[ERROR] No unknown visitor {cluster_id} (or no crop of it).")
+        return False
+    os.makedirs(ENROLLED_DIR, exist_ok=True)
+    # Name.jpg, then Name1.jpg, ...: trailing digits are dropped when photos are grouped by person
+    path, n = os.path.join(ENROLLED_DIR, f"{name}.jpg"), 0
+    while os.path.exists(path):
+        n += 1
+        path = os.path.join(ENROLLED_DIR, f"{name}{n}.jpg")
+    if not cv.imwrite(path, crop):
+        print(f"[ERROR] Cannot write {path}")
+        return False
+    store = GalleryStore(GALLERY_DIR)
+    # the crop may be too small to re-detect, so its encoding is the cluster centre
+    precomputed = {content_hash(path, store.params): centre}
+    encoded, reused, evicted = store.sync([path], precomputed=precomputed, evict=False)
+    print(f"[CACHE] {encoded + reused} encodings in '{GALLERY_DIR}' "
+          f"({encoded} encoded, {reused} reused, {evicted} evicted)")
+    clusters.remove(cluster_id)
+    clusters.save()
+    print(f"[OK] Enrolled unknown visitor {cluster_id} as '{name}' ({path})")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List and enroll recurring unknown visitors")
+    parser.add_argument('--top', type=int, default=10, help='How many visitors to list')
+    parser.add_argument('--min-visits', type=int, default=1, help='Only list visitors seen on this many visits')
+    parser.add_argument('--export', help='Write the crops of the listed visitors to this directory')
+    parser.add_argument('--enroll', nargs=2, metavar=('ID', 'NAME'), help='Enroll visitor ID under NAME')
+    parser.add_argument('--forget', type=int, metavar='ID', help='Drop visitor ID')
+    args = parser.parse_args()
+
+    clusters = UnknownClusters.load(UNKNOWNS_DIR)
+    if args.enroll:
+        cluster_id, name = args.enroll
+        if not cluster_id.isdigit():
+            parser.error("--enroll ID must be a number")
+        enroll(clusters, int(cluster_id), name)
+        return
+    if args.forget is not None:
+        if clusters.remove(args.forget):
+            clusters.save()
+            print(f"[OK] Forgot unknown visitor {args.forget}")
+        else:
+            print(f"[ERROR] No unknown visitor {args.forget}.")
+        return
+
+    visitors = clusters.top(args.top, args.min_visits)
+    if not visitors:
+        print(f"[INFO] No unknown visitors in '{UNKNOWNS_DIR}'.")
+        return
+    if args.export:
+        os.makedirs(args.export, exist_ok=True)
+    print(f"{'id':>6} {'visits':>6} {'sightings':>9} {'first seen':>16} {'last seen':>16}")
+    for rank, visitor in enumerate(visitors, 1):
+        print(f"{visitor.id:>6} {visitor.visits:>6} {visitor.sightings:>9} "
+              f"{_when(visitor.first_seen):>16} {_when(visitor.last_seen):>16}")
+        crop = clusters.crop(visitor.id) if args.export else None
+        if crop is not None:
+            cv.imwrite(os.path.join(args.export, f"{rank:02d}_id{visitor.id}_{visitor.visits}visits.jpg"), crop)
+    print(f"\n{len(clusters)} unknown visitors in total. Enroll one with: "
+          f"python unknown_visitors.py --enroll ID NAME")
+
+
+if __name__ == '__main__':
+    main()
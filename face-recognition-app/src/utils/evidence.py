@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import queue
+import threading
+from collections import deque
+import cv2 as cv
+
+JPEG_QUALITY = 90
+
+
+class EvidenceWriter:
+    """
+    Saves annotated snapshots of recognition events (unlocks, timeouts) on
+    a background thread, so JPEG encoding and disk writes never stall the
+    recognition loop. submit() never blocks: when the queue is full the
+    snapshot is dropped and counted. Files go to one directory per day
+    (directory/YYYY-MM-DD/), each JPEG with a .json sidecar holding the
+    event metadata; once the directory grows past max_bytes the oldest
+    snapshots are deleted first.
+    """
+
+    def __init__(self, directory, max_bytes=500 * 2**20, queue_size=8, quality=JPEG_QUALITY):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._snapshots = deque()   # ([jpeg, json paths], size), oldest first
+        self._total = 0
+        self._thread = None
+        # counters
+        self.written = 0
+        self.dropped = 0
+        self.evicted = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan()
+        self._thread = threading.Thread(target=self._run, name="EvidenceWriter", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, frame, event, name=None, distance=None, door=None, box=None, copy=True):
+        """
+        Queue a BGR frame for saving. Returns False (and counts a drop) when
+        the queue is full. The frame is copied unless copy=False, so pool
+        buffers can be recycled right after.
+        """
+        if self._queue.full():
+            self.dropped += 1
+            return False
+        meta = {"event": event, "name": name, "distance": distance, "door": door,
+                "box": list(box) if box is not None else None, "time": time.time()}
+        try:
+            self._queue.put_nowait((frame.copy() if copy else frame, meta))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def close(self, timeout=2.0):
+        """Write what is still queued (up to timeout) and stop the thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write(*item)
+            except (OSError, cv.error) as e:
+                print(f"[WARN] Cannot save snapshot: {e}")
+
+    def _write(self, frame, meta):
+        if meta["box"] is not None:
+            top, right, bottom, left = meta["box"]
+            color = (0, 255, 0) if meta["name"] else (0, 0, 255)
+            cv.rectangle(frame, (left, top), (right, bottom), color, 2)
+            label = meta["name"] or "unknown"
+            if meta["distance"] is not None:
+                label += f" {meta['distance']:.2f}"
+            cv.putText(frame, label, (left, max(0, top - 5)), cv.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+        ok, jpeg = cv.imencode(".jpg", frame, [cv.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise OSError("JPEG encoding failed")
+
+        stamp = time.localtime(meta["time"])
+        day_dir = os.path.join(self.directory, time.strftime("%Y-%m-%d", stamp))
+        os.makedirs(day_dir, exist_ok=True)
+        millis = int(meta["time"] * 1000) % 1000
+        parts = [time.strftime("%H%M%S", stamp) + f"_{millis:03d}", meta["event"]]
+        if meta["door"]:
+            parts.append(meta["door"])
+        if meta["name"]:
+            parts.append("".join(c for c in meta["name"] if c.isalnum() or c in "-_"))
+        base = os.path.join(day_dir, "_".join(parts))
+        jpeg_path, meta_path = base + ".jpg", base + ".json"
+        with open(jpeg_path, "wb") as f:
+            f.write(jpeg.tobytes())
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        size = os.path.getsize(jpeg_path) + os.path.getsize(meta_path)
+        self._snapshots.append(([jpeg_path, meta_path], size))
+        self._total += size
+        self.written += 1
+        self._evict()
+
+    def _scan(self):
+        """Pick up snapshots from earlier runs; day directories and file names sort by time."""
+        self._snapshots.clear()
+        self._total = 0
+        for day in sorted(os.listdir(self.directory)):
+            day_dir = os.path.join(self.directory, day)
+            if not os.path.isdir(day_dir):
+                continue
+            by_base = {}
+            for name in sorted(os.listdir(day_dir)):
+                by_base.setdefault(os.path.splitext(name)[0], []).append(os.path.join(day_dir, name))
+            for base in sorted(by_base):
+                paths = by_base[base]
+                size = sum(os.path.getsize(p) for p in paths)
+                self._snapshots.append((paths, size))
+                self._total += size
+        self._evict()
+
+    def _evict(self):
+        """Delete the oldest snapshots until under max_bytes; the newest one is always kept."""
+        while self._total > self.max_bytes and len(self._snapshots) > 1:
+            paths, size = self._snapshots.popleft()
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total -= size
+            self.evicted += 1
+            day_dir = os.path.dirname(paths[0])
+            if not os.listdir(day_dir):
+                os.rmdir(day_dir)
+
+    def stats(self):
+        return {"written": self.written, "dropped": self.dropped, "evicted": self.evicted,
+                "queued": self._queue.qsize(), "bytes": self._total}
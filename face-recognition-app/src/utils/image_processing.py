@@ -1,21 +1,115 @@
+import os
+import glob
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2 as cv
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
 def load_image(file_path):
     """Load an image from the specified file path."""
-    import cv2 as cv
     image = cv.imread(file_path)
     if image is None:
         raise FileNotFoundError(f"Image not found at {file_path}")
     return image
 
-def preprocess_image(image, size=(640, 480)):
+def resize_keep_aspect(image, size, upscale=False):
+    """Resize the image to fit inside size=(width, height) without changing its aspect ratio."""
+    height, width = image.shape[:2]
+    scale = min(size[0] / float(width), size[1] / float(height))
+    if scale >= 1.0 and not upscale:
+        return image
+    new_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    interpolation = cv.INTER_AREA if scale < 1.0 else cv.INTER_LINEAR
+    return cv.resize(image, new_size, interpolation=interpolation)
+
+def preprocess_image(image, size=(640, 480), keep_aspect=False):
     """Preprocess the image for face detection."""
-    import cv2 as cv
     gray_image = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+    if keep_aspect:
+        return resize_keep_aspect(gray_image, size)
     resized_image = cv.resize(gray_image, size)
     return resized_image
 
+def iter_image_paths(source):
+    """
+    Image paths from a directory (searched recursively), a glob pattern,
+    or a manifest file listing one path per line (anything after a tab on
+    the line is a label, see iter_labelled_paths).
+    """
+    if os.path.isdir(source):
+        found = glob.glob(os.path.join(source, "**", "*"), recursive=True)
+        return sorted(p for p in found if p.lower().endswith(IMAGE_EXTENSIONS))
+    if os.path.isfile(source) and not source.lower().endswith(IMAGE_EXTENSIONS):
+        with open(source, "r", encoding="utf-8") as f:
+            return [line.partition("\t")[0].strip() for line in f if line.strip() and not line.startswith("#")]
+    return sorted(glob.glob(source, recursive=True))
+
+def iter_labelled_paths(source):
+    """
+    (path, label) for every image of source, label being the person it
+    shows: the folder it is in for a directory tree (photos/Nour/001.jpg
+    is 'Nour'), the second tab-separated column of a manifest line, else
+    the file name without extension. Relative manifest paths are taken
+    from the manifest's folder, so a registered manifest means the same
+    whichever folder the store is synced from.
+    """
+    if os.path.isdir(source):
+        root = os.path.normpath(source)
+        return [(path, os.path.basename(os.path.dirname(path)) if os.path.dirname(path) != root else _stem(path))
+                for path in (os.path.normpath(p) for p in iter_image_paths(source))]
+    if os.path.isfile(source) and not source.lower().endswith(IMAGE_EXTENSIONS):
+        labelled = []
+        folder = os.path.dirname(source)
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                path, _, label = line.rstrip("\r\n").partition("\t")
+                path = os.path.join(folder, path.strip())
+                labelled.append((path, label.strip() or _stem(path)))
+        return labelled
+    return [(path, _stem(path)) for path in iter_image_paths(source)]
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def stream_images(source, transform=None, workers=4, prefetch=8):
+    """
+    Yield (path, image) for every image of source, in order.
+    Decoding (and the optional transform, e.g. resize_keep_aspect) runs on
+    a thread pool with at most prefetch images in flight, so memory stays
+    bounded however many images there are. Unreadable files are skipped.
+    source is anything iter_image_paths accepts, or a list of paths.
+    """
+    paths = iter_image_paths(source) if isinstance(source, str) else list(source)
+
+    def load(path):
+        image = cv.imread(path)
+        if image is not None and transform is not None:
+            image = transform(image)
+        return image
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append((path, pool.submit(load, path)))
+            if len(pending) >= prefetch:
+                yield from _ready(pending.popleft())
+        while pending:
+            yield from _ready(pending.popleft())
+
+def _ready(item):
+    path, future = item
+    image = future.result()
+    if image is None:
+        print(f"[WARN] cv.imread failed: {path}")
+        return
+    yield path, image
+
 def display_image(image, window_name='Face Recognition Output'):
     """Display the image in a window."""
-    import cv2 as cv
     cv.imshow(window_name, image)
     cv.waitKey(0)
-    cv.destroyAllWindows()
\ No newline at end of file
+    cv.destroyAllWindows()
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+WINDOW = 1000   # samples kept per stage for percentiles and histograms
+
+
+class _NullStage:
+    """Context manager that does nothing; what stage() hands out when timing is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+def stage(timer, name):
+    """timer.stage(name), or the shared no-op context when timer is None."""
+    return NULL_STAGE if timer is None else timer.stage(name)
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class StageTimer:
+    """
+    Wall-clock time per named stage of the recognition loop. The last
+    window samples of each stage are kept for percentiles and histograms;
+    counts and totals cover the whole session. Safe to share between the
+    capture, recognition and main threads. With timing off callers pass
+    timer=None and stage() hands out a shared no-op context instead.
+    started is when the session began (e.g. before the gallery load and
+    camera open); the decision is timed from then and from the moment
+    the timer was made, when the loop is ready to run.
+    """
+
+    def __init__(self, window=WINDOW, started=None):
+        self.window = window
+        self.ready = time.perf_counter()
+        self.started = self.ready if started is None else started
+        self.decision = None           # (kind, seconds after started, seconds after ready)
+        self._samples = {}
+        self._counts = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def add(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+                self._totals[name] = 0.0
+            samples.append(seconds)
+            self._counts[name] += 1
+            self._totals[name] += seconds
+
+    def decide(self, kind):
+        """Record the session's decision (match, no_match, ...) and the time it took; first call wins."""
+        if self.decision is None:
+            now = time.perf_counter()
+            self.decision = (kind, now - self.started, now - self.ready)
+
+    def summary(self):
+        """stage -> count, total and mean over the session, percentiles over the window (ms)."""
+        with self._lock:
+            snapshot = {name: (np.array(s), self._counts[name], self._totals[name])
+                        for name, s in self._samples.items()}
+        out = {}
+        for name, (window, count, total) in snapshot.items():
+            ms = window * 1000.0
+            out[name] = {
+                "count": count,
+                "total_s": total,
+                "mean_ms": total / count * 1000.0,
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "max_ms": float(ms.max()),
+                "window": len(ms),
+                "window_total_s": float(window.sum()),
+                "histogram": self._histogram(ms),
+            }
+        return out
+
+    @staticmethod
+    def _histogram(ms):
+        """Cumulative counts of window samples <= each bucket bound, Prometheus style."""
+        counts = np.searchsorted(np.sort(ms), BUCKETS_MS, side="right")
+        return {str(bound): int(n) for bound, n in zip(BUCKETS_MS, counts)}
+
+    def report(self):
+        """Print one [TIMING] line per stage, slowest total first, then the decision."""
+        summary = self.summary()
+        for name, s in sorted(summary.items(), key=lambda kv: -kv[1]["total_s"]):
+            print(f"[TIMING] {name:<10} n={s['count']:<6} total={s['total_s']:7.2f}s "
+                  f"mean={s['mean_ms']:7.1f}ms p50={s['p50_ms']:7.1f}ms p95={s['p95_ms']:7.1f}ms "
+                  f"p99={s['p99_ms']:7.1f}ms max={s['max_ms']:7.1f}ms")
+        if self.decision is not None:
+            kind, total, loop = self.decision
+            print(f"[TIMING] time to decision ({kind}): {total:.2f}s from start, {loop:.2f}s after start-up")
+
+    def write_prometheus(self, path):
+        """Prometheus text exposition, e.g. for node_exporter's textfile collector."""
+        lines = ["# HELP face_stage_seconds Recognition stage time (buckets over the last samples).",
+                 "# TYPE face_stage_seconds histogram"]
+        for name, s in sorted(self.summary().items()):
+            for bound, n in s["histogram"].items():
+                lines.append(f'face_stage_seconds_bucket{{stage="{name}",le="{int(bound) / 1000.0}"}} {n}')
+            lines.append(f'face_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {s["window"]}')
+            lines.append(f'face_stage_seconds_sum{{stage="{name}"}} {s["window_total_s"]:.6f}')
+            lines.append(f'face_stage_seconds_count{{stage="{name}"}} {s["window"]}')
+        if self.decision is not None:
+            lines += ["# HELP face_time_to_decision_seconds Session start to door decision.",
+                      "# TYPE face_time_to_decision_seconds gauge",
+                      f'face_time_to_decision_seconds{{decision="{self.decision[0]}"}} {self.decision[1]:.6f}',
+                      "# HELP face_loop_time_to_decision_seconds End of start-up to door decision.",
+                      "# TYPE face_loop_time_to_decision_seconds gauge",
+                      f'face_loop_time_to_decision_seconds{{decision="{self.decision[0]}"}} {self.decision[2]:.6f}']
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        # the textfile collector must never see a half-written file
+        os.replace(tmp, path)
+
+    def write_jsonl(self, path):
+        """Append one JSON line for this session."""
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "decision": self.decision[0] if self.decision else None,
+            "time_to_decision_s": self.decision[1] if self.decision else None,
+            "loop_time_to_decision_s": self.decision[2] if self.decision else None,
+            "stages": self.summary(),
+        }
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")